@@ -0,0 +1,233 @@
+#######################################################################
+# bench_counters.py - hotkey-storm benchmarks for smw_exit_counter.py
+#                     and generic_counter.py, run outside OBS.
+########################################################################
+# Usage:
+#
+#   python benchmarks/bench_counters.py [--events 5000] [--rates 10,100,1000,0]
+#                                       [--fps 60] [--counters 4]
+#                                       [--lookup-us 20] [--data-us 1]
+#                                       [--update-us 300]
+#                                       [--output results.json]
+#
+# Each script is loaded from a scratch copy (they keep their journal
+# next to themselves) against the stub obspython.py, with simulated
+# costs for obs_get_source_by_name, the obs_data_* calls and
+# obs_source_update.  --events hotkey presses (mostly increments, some
+# decrements, the odd reset) are then fired through the registered
+# hotkey callbacks at each of --rates presses per second (0: all of
+# them inside a single frame).  Time is simulated: the stub's timers
+# are ticked once per frame at --fps between presses, so nothing
+# actually sleeps.
+#
+# Reported per script and rate, as JSON:
+#   hotkey_us             latency of the hotkey callback itself
+#   frame_us              latency of the frame ticks that did any work
+#   obs_calls_per_event   OBS API calls (obs_source_update etc.) per press
+#   allocs_per_event      tracemalloc blocks/bytes still allocated per
+#                         press afterwards (measured in a second pass,
+#                         since tracing skews the timings)
+########################################################################
+
+import os
+import sys
+import json
+import time
+import random
+import shutil
+import argparse
+import platform
+import tempfile
+import importlib
+import tracemalloc
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, BENCH_DIR)
+
+import obspython as obs
+
+SCRIPTS = ("smw_exit_counter", "generic_counter")
+# press mix: mostly increments, a few take-backs, the odd reset
+ACTIONS = (0,) * 16 + (1,) * 3 + (2,)
+
+
+def percentiles(samples):
+    if not samples:
+        return None
+    samples = sorted(samples)
+    pick = lambda q: samples[int(q * (len(samples) - 1))]
+    return {
+        'mean':     round(sum(samples) / len(samples), 3),
+        'p50':      round(pick(0.50), 3),
+        'p95':      round(pick(0.95), 3),
+        'p99':      round(pick(0.99), 3),
+        'max':      round(samples[-1], 3)
+    }
+
+
+def per_event(counts, events):
+    return {name: round(count / events, 3) for name, count in sorted(counts.items())}
+
+
+class Rig(object):
+    """ one freshly loaded counter script, wired to stub text sources """
+
+    def __init__(self, name, work_dir, counters):
+        # start from zero, not from whatever the previous run left in the journal
+        for path in os.listdir(work_dir):
+            if not path.endswith(".py"):
+                os.remove(os.path.join(work_dir, path))
+        obs.reset()
+        if name in sys.modules:
+            self.script = importlib.reload(sys.modules[name])
+        else:
+            self.script = importlib.import_module(name)
+
+        settings = obs.Data()
+        self.script.script_defaults(settings)
+        if name == "generic_counter":
+            for index in range(counters):
+                source = "Counter {}".format(index + 1)
+                obs.add_source(source, "text_gdiplus")
+                settings[self.script.setting_key("text_source", index)] = source
+            settings["counter_count"] = counters
+        else:
+            obs.add_source("SMW Counter", "text_gdiplus")
+            settings["text_source"] = "SMW Counter"
+
+        self.script.script_load(settings)
+        self.script.script_update(settings)
+        obs.run_timers()
+
+        # what OBS would call for each hotkey: [counter][increment, decrement, reset]
+        if name == "generic_counter":
+            callbacks = [hotkey.callback for hotkey in self.script.hotkeys.hotkeys]
+            self.hotkeys = [callbacks[i:i + 3] for i in range(0, len(callbacks), 3)]
+        else:
+            self.hotkeys = [[self.script.increment_callback, self.script.decrement_callback, self.script.reset_callback]]
+
+    def close(self):
+        self.script.script_unload()
+
+
+def storm(rig, events, rate, fps, seed=0):
+    """ fire `events` presses at `rate`/s, ticking timers once per simulated frame in between """
+    rnd = random.Random(seed)
+    presses = [(rnd.choice(rig.hotkeys), rnd.choice(ACTIONS)) for _ in range(events)]
+    frame = 1.0 / fps
+    next_frame = frame
+    hotkey_us, frame_us = [], []
+
+    def tick():
+        before = sum(obs.calls.values())
+        started = time.perf_counter()
+        obs.run_timers()
+        elapsed = time.perf_counter() - started
+        if sum(obs.calls.values()) != before:
+            frame_us.append(elapsed * 1e6)
+
+    for n, (callbacks, action) in enumerate(presses):
+        now = n / rate if rate else 0.0
+        while next_frame <= now:
+            tick()
+            next_frame += frame
+
+        callback = callbacks[action]
+        started = time.perf_counter()
+        callback(True)
+        hotkey_us.append((time.perf_counter() - started) * 1e6)
+
+    # and the frame after the last press, which puts it on screen
+    tick()
+    return hotkey_us, frame_us
+
+
+def run(name, work_dir, args, rate):
+    rig = Rig(name, work_dir, args.counters)
+    obs.calls.clear()
+    try:
+        hotkey_us, frame_us = storm(rig, args.events, rate, args.fps)
+        calls = dict(obs.calls)
+    finally:
+        rig.close()
+
+    # second pass, traced, for allocations
+    rig = Rig(name, work_dir, args.counters)
+    tracemalloc.start()
+    try:
+        before = tracemalloc.take_snapshot()
+        storm(rig, args.events, rate, args.fps)
+        after = tracemalloc.take_snapshot()
+    finally:
+        tracemalloc.stop()
+        rig.close()
+
+    diff = after.compare_to(before, 'filename')
+    return {
+        'rate':                 rate,
+        'events':               args.events,
+        'hotkey_us':            percentiles(hotkey_us),
+        'frame_us':             percentiles(frame_us),
+        'frames_with_work':     len(frame_us),
+        'source_updates':       calls.get('obs_source_update', 0),
+        'obs_calls_per_event':  per_event(calls, args.events),
+        'allocs_per_event': {
+            'blocks':   round(sum(stat.count_diff for stat in diff) / args.events, 3),
+            'bytes':    round(sum(stat.size_diff for stat in diff) / args.events, 1)
+        }
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Hotkey-storm benchmarks for the counter scripts")
+    parser.add_argument('--events', type=int, default=5000, help="hotkey presses per run")
+    parser.add_argument('--rates', default="10,100,1000,0", help="comma-separated presses per second (0: all in one frame)")
+    parser.add_argument('--fps', type=float, default=60.0)
+    parser.add_argument('--counters', type=int, default=4, help="counters (and text sources) generic_counter drives")
+    parser.add_argument('--lookup-us', type=float, default=20.0, help="simulated cost of obs_get_source_by_name")
+    parser.add_argument('--data-us', type=float, default=1.0, help="simulated cost of each obs_data_* call")
+    parser.add_argument('--update-us', type=float, default=300.0, help="simulated cost of obs_source_update (text re-render)")
+    parser.add_argument('--scripts', default=",".join(SCRIPTS))
+    parser.add_argument('--output', help="write results here instead of stdout")
+    args = parser.parse_args()
+
+    obs.costs.update({
+        'obs_get_source_by_name':   args.lookup_us / 1e6,
+        'obs_data_create':          args.data_us / 1e6,
+        'obs_data_set_string':      args.data_us / 1e6,
+        'obs_data_release':         args.data_us / 1e6,
+        'obs_source_update':        args.update_us / 1e6
+    })
+
+    # the scripts keep their journal next to themselves, so run scratch copies (with script_common.py, as in OBS)
+    work_dir = tempfile.mkdtemp(prefix="counter-bench-")
+    shutil.copy(os.path.join(REPO_DIR, "script_common.py"), work_dir)
+    sys.path.insert(0, work_dir)
+    results = {}
+    try:
+        for name in args.scripts.split(","):
+            shutil.copy(os.path.join(REPO_DIR, name + ".py"), work_dir)
+            results[name] = [run(name, work_dir, args, float(rate)) for rate in args.rates.split(",")]
+    finally:
+        sys.path.remove(work_dir)
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    report = json.dumps({
+        'benchmark':    'counters',
+        'timestamp':    time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+        'python':       platform.python_version(),
+        'platform':     platform.platform(),
+        'config':       vars(args),
+        'scripts':      results
+    }, indent=2)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(report + "\n")
+    else:
+        print(report)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,199 @@
+#######################################################################
+# bench_exit_feed.py - replays recorded emulator exit events into
+#                      smw_exit_counter.py's exit feed and measures
+#                      event-to-display latency.
+########################################################################
+# Usage:
+#
+#   python benchmarks/bench_exit_feed.py [--events fixtures/smw_exits.jsonl]
+#                                        [--speed 1000] [--fps 60]
+#                                        [--output results.json]
+#
+#   python benchmarks/bench_exit_feed.py --send-to 8768 [--speed 1]
+#
+# By default a scratch copy of smw_exit_counter.py is loaded against
+# the stub obspython.py, with a thread ticking its timers at --fps like
+# OBS's video thread would.  The events (seconds since the start of the
+# run, level, exit type) are sent over UDP to the exit feed, --speed
+# times faster than they were recorded.  Each reply's latency_ms (event
+# received -> text source updated) and the client-side round trip are
+# reported as JSON, along with how many exits were counted and how many
+# obs_source_update calls it took; duplicates in the recording must not
+# be counted.
+#
+# With --send-to, the events are just replayed to that port on
+# localhost, e.g. into a real OBS with the exit feed enabled.
+########################################################################
+
+import os
+import sys
+import json
+import time
+import shutil
+import socket
+import argparse
+import platform
+import tempfile
+import threading
+import importlib
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, BENCH_DIR)
+
+import obspython as obs
+
+SCRIPT_PATH = os.path.join(os.path.dirname(BENCH_DIR), "smw_exit_counter.py")
+
+
+def percentiles(samples):
+    samples = sorted(samples)
+    pick = lambda q: samples[int(q * (len(samples) - 1))]
+    return {
+        'mean':     round(sum(samples) / len(samples), 3),
+        'p50':      round(pick(0.50), 3),
+        'p95':      round(pick(0.95), 3),
+        'max':      round(samples[-1], 3)
+    }
+
+
+def load_events(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def free_port():
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    sock.bind(('127.0.0.1', 0))
+    port = sock.getsockname()[1]
+    sock.close()
+    return port
+
+
+def replay(events, port, speed, on_reply=None):
+    """ send events to the feed on schedule; returns (event, reply, round trip seconds) for each """
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    sock.settimeout(2.0)
+    results = []
+    started = time.perf_counter()
+    for event in events:
+        delay = started + event['t'] / speed - time.perf_counter()
+        if delay > 0:
+            time.sleep(delay)
+
+        sent = time.perf_counter()
+        sock.sendto(json.dumps({'level': event['level'], 'exit': event['exit']}).encode('utf-8'), ('127.0.0.1', port))
+        try:
+            reply = json.loads(sock.recv(65535).decode('utf-8'))
+        except socket.timeout:
+            reply = None
+        results.append((event, reply, time.perf_counter() - sent))
+        if on_reply is not None:
+            on_reply(event, reply)
+    sock.close()
+    return results
+
+
+class FrameClock(object):
+    """ ticks the stub's timers at a fixed rate on its own thread, like OBS's video thread """
+
+    def __init__(self, fps):
+        self.interval = 1.0 / fps
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        next_frame = time.perf_counter()
+        while not self._stop.is_set():
+            obs.run_timers()
+            next_frame += self.interval
+            delay = next_frame - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+
+
+def run_local(events, speed, fps):
+    # the script keeps its journal next to itself, so load a scratch copy of it (with script_common.py, as in OBS)
+    work_dir = tempfile.mkdtemp(prefix="smw-exit-feed-")
+    shutil.copy(SCRIPT_PATH, work_dir)
+    shutil.copy(os.path.join(os.path.dirname(SCRIPT_PATH), "script_common.py"), work_dir)
+    sys.path.insert(0, work_dir)
+    try:
+        smw = importlib.import_module("smw_exit_counter")
+        source = obs.add_source("SMW Counter", "text_gdiplus")
+        port = free_port()
+
+        settings = obs.Data()
+        smw.script_defaults(settings)
+        settings.update(text_source="SMW Counter", exit_feed_enable=True, exit_feed_port=port)
+        smw.script_load(settings)
+        smw.script_update(settings)
+
+        clock = FrameClock(fps).start()
+        time.sleep(0.1)
+        obs.calls.clear()
+        try:
+            results = replay(events, port, speed)
+        finally:
+            clock.stop()
+            smw.script_unload()
+
+        unique = {(smw.ExitSet.bit(e['level'], e['exit'])) for e in events}
+        replies = [reply for _, reply, _ in results if reply is not None]
+        return {
+            'events':               len(events),
+            'unique_exits':         len(unique),
+            'counted':              smw.ctr.counter,
+            'dropped':              len(events) - len(replies),
+            'errors':               sum(1 for reply in replies if not reply['ok']),
+            'final_text':           source.settings.get('text'),
+            'source_updates':       obs.calls['obs_source_update'],
+            'feed_latency_ms':      percentiles([reply['latency_ms'] for reply in replies]),
+            'round_trip_ms':        percentiles([seconds * 1000 for _, _, seconds in results]),
+            'frame_ms':             round(1000.0 / fps, 3)
+        }
+    finally:
+        sys.path.remove(work_dir)
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay recorded SMW exit events into smw_exit_counter.py's exit feed")
+    parser.add_argument('--events', default=os.path.join(BENCH_DIR, "fixtures", "smw_exits.jsonl"))
+    parser.add_argument('--speed', type=float, default=1000.0, help="replay this many times faster than recorded")
+    parser.add_argument('--fps', type=float, default=60.0, help="simulated OBS frame rate")
+    parser.add_argument('--send-to', type=int, metavar='PORT', help="just replay to this port (e.g. a real OBS) and print the replies")
+    parser.add_argument('--output', help="write results here instead of stdout")
+    args = parser.parse_args()
+
+    events = load_events(args.events)
+
+    if args.send_to:
+        replay(events, args.send_to, args.speed, lambda event, reply: print(json.dumps({'event': event, 'reply': reply})))
+        return
+
+    report = json.dumps({
+        'benchmark':    'exit_feed',
+        'timestamp':    time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+        'python':       platform.python_version(),
+        'platform':     platform.platform(),
+        'config':       vars(args),
+        'results':      run_local(events, args.speed, args.fps)
+    }, indent=2)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(report + "\n")
+    else:
+        print(report)
+
+
+if __name__ == '__main__':
+    main()
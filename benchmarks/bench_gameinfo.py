@@ -0,0 +1,214 @@
+#######################################################################
+# bench_gameinfo.py - end-to-end refresh benchmarks for gameinfo.py,
+#                     run outside OBS against the fake Twitch/IGDB API.
+########################################################################
+# Usage:
+#
+#   python benchmarks/bench_gameinfo.py [--iterations 50] [--latency-ms 40]
+#                                       [--error-rate 0.0] [--panels 5]
+#                                       [--output results.json]
+#
+# Needs gameinfo.py's real dependencies (requests, jinja2) installed;
+# OBS itself is replaced by the stub obspython.py next to this file.
+#
+# Scenarios:
+#   cold_refresh      fresh caches: token, user, channel, IGDB, covers
+#   warm_refresh      everything cached except the channel's category
+#   poll_unchanged    poller tick where the category hasn't changed
+#   category_change   poller tick where the category changed to a game
+#                     that's already in the IGDB cache
+#   fanout_render     re-rendering N browser source panels for a new game
+#
+# Results (latency percentiles, API requests and OBS calls per
+# iteration, peak traced memory) are printed as JSON, so runs can be
+# diffed across versions.
+########################################################################
+
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import platform
+import tempfile
+import tracemalloc
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+sys.path.insert(0, BENCH_DIR)
+
+import obspython as obs
+import gameinfo
+from fake_api import FakeApiServer
+
+
+def percentiles(samples):
+    samples = sorted(samples)
+    pick = lambda q: samples[int(q * (len(samples) - 1))]
+    return {
+        'mean':     round(sum(samples) / len(samples), 3),
+        'p50':      round(pick(0.50), 3),
+        'p95':      round(pick(0.95), 3),
+        'max':      round(samples[-1], 3)
+    }
+
+
+def per_iteration(counts, iterations):
+    return {name: round(count / iterations, 3) for name, count in sorted(counts.items())}
+
+
+class Harness(object):
+    """ one GameInfo wired to the fake API and the stub OBS """
+
+    def __init__(self, api, cache_dir, panels=0):
+        gameinfo.CACHE_DIR = cache_dir
+        self.gi = gameinfo.GameInfo("benchclientid", "benchclientsecret", "theonetruelx")
+        self.gi.template = gameinfo.default_template
+        self.gi.source_name = "Game Info"
+        obs.add_source(self.gi.source_name, "browser_source")
+        for i in range(panels):
+            name = "Game Info {}".format(i + 1)
+            obs.add_source(name, "browser_source")
+            self.gi.extra_panels.append((name, ""))
+
+        self._done = False
+        refresh_done, unchanged = self.gi.refresh_done, self.gi.poller.unchanged
+
+        def _refresh_done(game_info):
+            refresh_done(game_info)
+            self._done = True
+
+        def _unchanged():
+            unchanged()
+            self._done = True
+
+        self.gi.refresh_done = _refresh_done
+        self.gi.poller.unchanged = _unchanged
+
+    def run(self, start, timeout=60):
+        """ start() a refresh and pump the OBS-thread poll until it has been applied; returns seconds taken """
+        self._done = False
+        started = time.perf_counter()
+        start()
+        deadline = started + timeout
+        while not self._done:
+            if time.perf_counter() > deadline:
+                raise RuntimeError("refresh didn't finish within {}s".format(timeout))
+            time.sleep(0.0005)
+            self.gi.worker.poll()
+        return time.perf_counter() - started
+
+    def close(self):
+        self.gi.worker.stop()
+        self.gi.cover_cache.close()
+        self.gi.igdb_cache.close()
+        self.gi.game_index.close()
+        self.gi.http.close()
+
+
+def scenario(api, iterations, setup, step):
+    """ run step(setup(), i) `iterations` times, collecting latency, request counts, OBS calls and memory """
+    harness = setup()
+    api.take_counts()
+    obs.calls.clear()
+    if hasattr(tracemalloc, 'reset_peak'):
+        tracemalloc.reset_peak()
+
+    latencies = []
+    requests = {}
+    try:
+        for i in range(iterations):
+            latencies.append(step(harness, i) * 1000)
+            for endpoint, count in api.take_counts().items():
+                requests[endpoint] = requests.get(endpoint, 0) + count
+    finally:
+        if harness is not None:
+            harness.close()
+
+    return {
+        'iterations':               iterations,
+        'latency_ms':               percentiles(latencies),
+        'requests_per_iteration':   per_iteration(requests, iterations),
+        'obs_calls_per_iteration':  per_iteration(obs.calls, iterations),
+        'peak_memory_kb':           round(tracemalloc.get_traced_memory()[1] / 1024, 1)
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="End-to-end refresh benchmarks for gameinfo.py")
+    parser.add_argument('--iterations', type=int, default=50)
+    parser.add_argument('--latency-ms', type=float, default=40.0, help="simulated API round trip per request")
+    parser.add_argument('--error-rate', type=float, default=0.0, help="fraction of requests answered with a 503")
+    parser.add_argument('--panels', type=int, default=5, help="extra browser source panels for fanout_render")
+    parser.add_argument('--output', help="write results here instead of stdout")
+    args = parser.parse_args()
+
+    api = FakeApiServer(latency=args.latency_ms / 1000, error_rate=args.error_rate).start()
+    api.patch(gameinfo)
+    work_dir = tempfile.mkdtemp(prefix="gameinfo-bench-")
+    tracemalloc.start()
+
+    games = [game['name'] for game in api.games]
+    results = {}
+
+    def cold(_, i):
+        # a brand new GameInfo with empty caches every time
+        h = Harness(api, os.path.join(work_dir, "cold-{}".format(i)))
+        try:
+            return h.run(h.gi.refresh)
+        finally:
+            h.close()
+
+    results['cold_refresh'] = scenario(api, args.iterations, obs.reset, cold)
+
+    def warm():
+        obs.reset()
+        h = Harness(api, os.path.join(work_dir, "warm"), panels=args.panels)
+        h.run(h.gi.refresh)
+        for name in games:
+            api.game_name = name
+            h.run(h.gi.refresh)
+        api.game_name = games[0]
+        h.run(h.gi.refresh)
+        return h
+
+    results['warm_refresh'] = scenario(api, args.iterations, warm, lambda h, i: h.run(h.gi.refresh))
+    results['poll_unchanged'] = scenario(api, args.iterations, warm, lambda h, i: h.run(h.gi.check_category))
+
+    def change_category(h, i):
+        api.game_name = games[(i + 1) % len(games)]
+        return h.run(h.gi.check_category)
+
+    results['category_change'] = scenario(api, args.iterations, warm, change_category)
+
+    def fanout(h, i):
+        h.gi.game_info = h.gi.game_info._replace(game_name="{} ({})".format(games[0], i))
+        started = time.perf_counter()
+        h.gi.generate_html()
+        return time.perf_counter() - started
+
+    results['fanout_render'] = scenario(api, args.iterations, warm, fanout)
+    results['fanout_render']['panels'] = args.panels + 1
+
+    api.stop()
+    shutil.rmtree(work_dir, ignore_errors=True)
+
+    report = json.dumps({
+        'benchmark':    'gameinfo',
+        'timestamp':    time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+        'python':       platform.python_version(),
+        'platform':     platform.platform(),
+        'config':       vars(args),
+        'scenarios':    results
+    }, indent=2)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(report + "\n")
+    else:
+        print(report)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,201 @@
+#######################################################################
+# bench_normalize.py - micro-benchmark for turning an IGDB games
+#                      response into the game_info templates get.
+########################################################################
+# Usage:
+#
+#   python benchmarks/bench_normalize.py [--iterations 200]
+#                                        [--release-dates 400]
+#                                        [--companies 300] [--platforms 60]
+#                                        [--output results.json]
+#
+# Runs GameRecord.from_igdb() over the recorded fixtures and over a
+# generated "multiplatform re-release" payload with hundreds of release
+# dates and companies, next to the dict-building parser it replaced
+# (legacy_parse below, kept verbatim as the baseline).  Reports time per
+# call, memory allocated while normalizing and the size of the result,
+# as JSON.
+########################################################################
+
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import platform
+import tracemalloc
+import datetime as dt
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+sys.path.insert(0, BENCH_DIR)
+
+import gameinfo
+from fake_api import load_fixture
+
+REGIONS = gameinfo.GameInfo.IGDB_REGION_ENUM
+
+
+def legacy_parse(game_info):
+    """ the original parse_game_info(), for comparison (loop variable renamed so it doesn't shadow platform) """
+    if len(game_info) > 0:
+        game_name = game_info[0]['name']
+        game_cover = gameinfo.IGDB_IMAGE_URL.format(size='cover_small', image_id=game_info[0]['cover']['image_id'])
+
+        release_dates_sorted = sorted(game_info[0]['release_dates'], key = lambda i: i['date'])
+        release_dates_filtered = []
+        for release_date in release_dates_sorted:
+            if not any(i.get('region', False) == release_date['region'] for i in release_dates_filtered):
+                release_dates_filtered.append(release_date)
+
+        release_dates_final = []
+        for release_date in release_dates_filtered:
+            tmp = {
+                'date': dt.datetime.utcfromtimestamp(release_date['date']).strftime("%Y-%m"),
+                'region': REGIONS[release_date['region']]
+            }
+            release_dates_final.append(tmp)
+
+        platforms_filtered = []
+        for platform_info in game_info[0]['platforms']:
+            if 'abbreviation' in platform_info:
+                platforms_filtered.append(platform_info['abbreviation'])
+        platforms_filtered.sort()
+
+        developers_filtered = []
+        for developer in game_info[0]['involved_companies']:
+            if developer['developer'] == True:
+                developers_filtered.append(developer['company']['name'])
+
+        publishers_filtered = []
+        for publisher in game_info[0]['involved_companies']:
+            if publisher['publisher'] == True:
+                publishers_filtered.append(publisher['company']['name'])
+
+        return {
+            'game_name':        game_name,
+            'game_cover':       game_cover,
+            'release_dates':    release_dates_final,
+            'platforms':        ", ".join(platforms_filtered),
+            'developers':       developers_filtered,
+            'publishers':       publishers_filtered
+        }
+    else:
+        return None
+
+
+def record_parse(game_info):
+    return gameinfo.GameRecord.from_igdb(game_info[0], REGIONS) if game_info else None
+
+
+def generate_game(release_dates, companies, platforms, seed=0):
+    """ a big multiplatform game: every platform re-released in every region, a long list of involved companies """
+    rnd = random.Random(seed)
+    platform_list = [{'id': i, 'abbreviation': "PF{}".format(i)} for i in range(platforms)]
+    return {
+        'id': 1,
+        'name': "Generated Anthology Remastered",
+        'slug': "generated-anthology-remastered",
+        'cover': {'id': 1, 'image_id': "cogen1"},
+        'platforms': platform_list,
+        'involved_companies': [
+            {
+                'id': i,
+                'company': {'id': i, 'name': "Company {}".format(i)},
+                'developer': rnd.random() < 0.3,
+                'publisher': rnd.random() < 0.5
+            }
+            for i in range(companies)
+        ],
+        'release_dates': [
+            {
+                'id': i,
+                'date': rnd.randrange(600000000, 1700000000),
+                'region': rnd.choice(list(REGIONS)),
+                'platform': rnd.choice(platform_list)
+            }
+            for i in range(release_dates)
+        ]
+    }
+
+
+def deep_size(obj, seen=None):
+    """ rough retained size of a result: the object plus everything it holds """
+    seen = set() if seen is None else seen
+    if id(obj) in seen:
+        return 0
+    seen.add(id(obj))
+    size = sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        size += sum(deep_size(k, seen) + deep_size(v, seen) for k, v in obj.items())
+    elif isinstance(obj, (list, tuple)):
+        size += sum(deep_size(i, seen) for i in obj)
+    return size
+
+
+def measure(parse, payload, iterations):
+    parse(payload)  # warm-up
+
+    started = time.perf_counter()
+    for _ in range(iterations):
+        parse(payload)
+    per_call = (time.perf_counter() - started) / iterations
+
+    tracemalloc.start()
+    result = parse(payload)
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {
+        'us_per_call':      round(per_call * 1e6, 2),
+        'peak_alloc_kb':    round(peak / 1024, 2),
+        'result_bytes':     deep_size(result)
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Micro-benchmark for IGDB game normalization")
+    parser.add_argument('--iterations', type=int, default=200)
+    parser.add_argument('--release-dates', type=int, default=400)
+    parser.add_argument('--companies', type=int, default=300)
+    parser.add_argument('--platforms', type=int, default=60)
+    parser.add_argument('--output', help="write results here instead of stdout")
+    args = parser.parse_args()
+
+    payloads = {game['slug']: [game] for game in load_fixture("igdb_games.json")}
+    payloads['generated'] = [generate_game(args.release_dates, args.companies, args.platforms)]
+
+    results = {}
+    for name, payload in payloads.items():
+        legacy = legacy_parse(payload)
+        record = record_parse(payload)
+        # the rewrite must not change what the templates see
+        same = all(getattr(record, field) == value for field, value in legacy.items())
+
+        results[name] = {
+            'release_dates':    len(payload[0].get('release_dates', [])),
+            'companies':        len(payload[0].get('involved_companies', [])),
+            'same_output':      same,
+            'legacy':           measure(legacy_parse, payload, args.iterations),
+            'record':           measure(record_parse, payload, args.iterations)
+        }
+
+    report = json.dumps({
+        'benchmark':    'normalize',
+        'timestamp':    time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+        'python':       platform.python_version(),
+        'platform':     platform.platform(),
+        'config':       vars(args),
+        'payloads':     results
+    }, indent=2)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(report + "\n")
+    else:
+        print(report)
+
+
+if __name__ == '__main__':
+    main()
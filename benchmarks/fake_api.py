@@ -0,0 +1,175 @@
+#######################################################################
+# fake_api.py - local stand-in for the Twitch and IGDB APIs, replaying
+#               the recorded responses in fixtures/.
+########################################################################
+# Serves just enough of id.twitch.tv, api.twitch.tv/helix, api.igdb.com
+# and images.igdb.com for gameinfo.py to do a full refresh, with
+# configurable per-request latency and random 503s.  Requests are
+# counted per endpoint so benchmarks can report them.
+########################################################################
+
+import os
+import re
+import json
+import time
+import random
+import threading
+import collections
+import socketserver
+import http.server
+import urllib.parse
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+
+
+def load_fixture(name):
+    with open(os.path.join(FIXTURES_DIR, name), 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+class _Server(socketserver.ThreadingMixIn, http.server.HTTPServer):
+    daemon_threads = True
+
+
+class _Handler(http.server.BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    # headers and body go out as separate writes; don't let Nagle + delayed ACK add 40ms to every response
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        self._handle('GET')
+
+    def do_POST(self):
+        self._handle('POST')
+
+    def _handle(self, method):
+        api = self.server.api
+        url = urllib.parse.urlsplit(self.path)
+        body = self.rfile.read(int(self.headers.get('Content-Length') or 0)).decode('utf-8')
+        endpoint = api.endpoint_name(method, url.path)
+        api.count(endpoint)
+
+        if api.latency:
+            time.sleep(api.latency)
+        if api.should_fail():
+            return self._send(503, b'{"message":"injected failure"}', {'Retry-After': '0'})
+
+        status, payload = api.respond(endpoint, url, body)
+        if isinstance(payload, bytes):
+            return self._send(status, payload, {'Content-Type': 'image/jpeg'})
+        return self._send(status, json.dumps(payload).encode('utf-8'), {'Content-Type': 'application/json'})
+
+    def _send(self, status, body, headers):
+        self.send_response(status)
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+class FakeApiServer(object):
+    """ threaded HTTP server pretending to be Twitch + IGDB """
+
+    def __init__(self, latency=0.0, error_rate=0.0, seed=0):
+        self.latency = latency
+        self.error_rate = error_rate
+        self.twitch = load_fixture("twitch.json")
+        self.games = load_fixture("igdb_games.json")
+        self.game_name = self.twitch['channels']['data'][0]['game_name']
+        self.counts = collections.Counter()
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._server = None
+
+    @property
+    def base_url(self):
+        return "http://127.0.0.1:{}/".format(self._server.server_address[1])
+
+    def start(self):
+        self._server = _Server(('127.0.0.1', 0), _Handler)
+        self._server.api = self
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def patch(self, module):
+        """ point gameinfo's API URLs at this server """
+        module.TWITCH_TOKEN_URL = self.base_url + "oauth2/token"
+        module.TWITCH_HELIX_URL = self.base_url + "helix/"
+        module.IGDB_API_URL = self.base_url + "v4/"
+        module.IGDB_IMAGE_URL = self.base_url + "images/t_{size}/{image_id}.jpg"
+
+    def count(self, endpoint):
+        with self._lock:
+            self.counts[endpoint] += 1
+
+    def take_counts(self):
+        """ request counts since the last call """
+        with self._lock:
+            counts = dict(self.counts)
+            self.counts.clear()
+        return counts
+
+    def should_fail(self):
+        with self._lock:
+            return self.error_rate > 0 and self._random.random() < self.error_rate
+
+    @staticmethod
+    def endpoint_name(method, path):
+        if path.startswith('/images/'):
+            return 'igdb_image'
+        return {
+            '/oauth2/token': 'twitch_token',
+            '/helix/users': 'twitch_users',
+            '/helix/channels': 'twitch_channels',
+            '/v4/multiquery': 'igdb_multiquery',
+            '/v4/games': 'igdb_games'
+        }.get(path, 'unknown')
+
+    def respond(self, endpoint, url, body):
+        if endpoint == 'twitch_token':
+            return 200, self.twitch['token']
+        if endpoint == 'twitch_users':
+            return 200, self.twitch['users']
+        if endpoint == 'twitch_channels':
+            channels = json.loads(json.dumps(self.twitch['channels']))
+            channels['data'][0]['game_name'] = self.game_name
+            return 200, channels
+        if endpoint == 'igdb_multiquery':
+            return 200, self.multiquery(body)
+        if endpoint == 'igdb_games':
+            match = re.search(r'where id = (\d+);', body)
+            return 200, [game for game in self.games if match and game['id'] == int(match.group(1))]
+        if endpoint == 'igdb_image':
+            # deterministic stand-in "jpeg", roughly cover_small sized
+            return 200, (url.path.encode('utf-8') * 200)[:8192]
+        return 404, {'message': 'not found'}
+
+    def multiquery(self, body):
+        results = []
+        for endpoint, label, query in re.findall(r'query (\w+) "(\w+)" \{(.*?)\};', body, re.S):
+            name = re.search(r'(?:where name ~|search) "((?:[^"\\]|\\.)*)"', query)
+            slug = re.search(r'where slug = "([^"]*)"', query)
+            wanted = name.group(1).replace('\\"', '"').casefold() if name else None
+
+            if label == 'slug':
+                result = [g for g in self.games if slug and g['slug'] == slug.group(1)]
+            elif label == 'alternative':
+                result = [
+                    {'id': alt['id'], 'game': g}
+                    for g in self.games for alt in g.get('alternative_names', []) if alt['name'].casefold() == wanted
+                ]
+            elif label == 'search':
+                result = [g for g in self.games if wanted and all(word in g['name'].casefold() for word in wanted.split())]
+            else:
+                result = [g for g in self.games if g['name'].casefold() == wanted]
+
+            results.append({'name': label, 'result': result})
+        return results
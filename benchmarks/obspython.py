@@ -0,0 +1,311 @@
+#######################################################################
+# obspython.py - stand-in for the module OBS injects into scripts, so
+#                they can be imported and benchmarked outside of OBS.
+########################################################################
+# Only what the scripts in this repo actually use is implemented.
+# Sources, settings and timers are plain python objects; every API call
+# is counted in `calls`, so benchmarks can report how many of each
+# call a scenario made.  Calls listed in `costs` (name -> seconds) also
+# busy-wait that long, to stand in for what they cost inside OBS (a
+# name lookup across hundreds of sources, a GDI+ text re-render, ...).
+########################################################################
+
+import sys
+import time
+import collections
+
+calls = collections.Counter()
+costs = {}
+
+OBS_TEXT_DEFAULT = 0
+OBS_TEXT_PASSWORD = 1
+OBS_TEXT_MULTILINE = 2
+OBS_COMBO_TYPE_LIST = 2
+OBS_COMBO_FORMAT_STRING = 3
+OBS_EDITABLE_LIST_TYPE_STRINGS = 0
+OBS_GROUP_NORMAL = 1
+OBS_PATH_FILE = 0
+OBS_PATH_FILE_SAVE = 1
+OBS_INVALID_HOTKEY_ID = -1
+
+LOG_ERROR = 100
+LOG_WARNING = 200
+LOG_INFO = 300
+LOG_DEBUG = 400
+
+OBS_FRONTEND_EVENT_STREAMING_STARTING = 0
+OBS_FRONTEND_EVENT_STREAMING_STARTED = 1
+OBS_FRONTEND_EVENT_STREAMING_STOPPING = 2
+OBS_FRONTEND_EVENT_STREAMING_STOPPED = 3
+OBS_FRONTEND_EVENT_EXIT = 17
+
+
+class Data(dict):
+    """ obs_data_t """
+    pass
+
+
+class Source(object):
+    """ obs_source_t """
+
+    def __init__(self, name, source_id, settings=None):
+        self.name = name
+        self.id = source_id
+        self.settings = Data(settings or {})
+        self.updates = 0
+        self.refreshes = 0
+
+
+class WeakSource(object):
+    """ obs_weak_source_t """
+
+    def __init__(self, source):
+        self.source = source
+
+
+sources = collections.OrderedDict()
+timers = []
+frontend_callbacks = []
+signal_handlers = collections.defaultdict(list)
+streaming = False
+
+
+def reset():
+    """ forget all sources, timers and call counts """
+    calls.clear()
+    sources.clear()
+    del timers[:]
+    del frontend_callbacks[:]
+    signal_handlers.clear()
+
+
+def add_source(name, source_id, settings=None):
+    sources[name] = Source(name, source_id, settings)
+    _signal("source_create", source=sources[name])
+    return sources[name]
+
+
+def rename_source(old_name, new_name):
+    source = sources.pop(old_name)
+    source.name = new_name
+    sources[new_name] = source
+    _signal("source_rename", source=source, prev_name=old_name, new_name=new_name)
+
+
+def remove_source(name):
+    _signal("source_destroy", source=sources.pop(name))
+
+
+def _signal(signal, **calldata):
+    for callback in list(signal_handlers.get(signal, ())):
+        callback(calldata)
+
+
+def _count(name):
+    calls[name] += 1
+    cost = costs.get(name)
+    if cost:
+        deadline = time.perf_counter() + cost
+        while time.perf_counter() < deadline:
+            pass
+
+
+# sources
+
+def obs_get_source_by_name(name):
+    _count('obs_get_source_by_name')
+    return sources.get(name)
+
+def obs_source_release(source):
+    _count('obs_source_release')
+
+def obs_source_get_name(source):
+    return source.name
+
+def obs_source_get_unversioned_id(source):
+    return source.id
+
+def obs_source_get_settings(source):
+    _count('obs_source_get_settings')
+    return Data(source.settings)
+
+def obs_source_update(source, settings):
+    _count('obs_source_update')
+    source.settings.update(settings)
+    source.updates += 1
+
+def obs_source_get_weak_source(source):
+    _count('obs_source_get_weak_source')
+    return WeakSource(source)
+
+def obs_weak_source_get_source(weak_source):
+    _count('obs_weak_source_get_source')
+    source = weak_source.source
+    return source if source is not None and sources.get(source.name) is source else None
+
+def obs_weak_source_release(weak_source):
+    pass
+
+def obs_enum_sources():
+    _count('obs_enum_sources')
+    return list(sources.values())
+
+def source_list_release(source_list):
+    pass
+
+
+# settings
+
+def obs_data_create():
+    _count('obs_data_create')
+    return Data()
+
+def obs_data_release(data):
+    _count('obs_data_release')
+
+def obs_data_get_string(data, name):
+    return data.get(name, "")
+
+def obs_data_get_int(data, name):
+    return data.get(name, 0)
+
+def obs_data_get_bool(data, name):
+    return data.get(name, False)
+
+def obs_data_get_array(data, name):
+    return data.get(name, [])
+
+def obs_data_set_string(data, name, value):
+    _count('obs_data_set_string')
+    data[name] = value
+
+def obs_data_set_int(data, name, value):
+    data[name] = value
+
+def obs_data_set_bool(data, name, value):
+    data[name] = value
+
+def obs_data_set_array(data, name, value):
+    data[name] = value
+
+def _set_default(data, name, value):
+    # a default never replaces a value that's already been set
+    data.setdefault(name, value)
+
+obs_data_set_default_string = _set_default
+obs_data_set_default_int = _set_default
+obs_data_set_default_bool = _set_default
+
+def obs_data_array_count(array):
+    return len(array)
+
+def obs_data_array_item(array, index):
+    return array[index]
+
+def obs_data_array_release(array):
+    pass
+
+
+# properties (the UI isn't drawn, so these just need to not explode)
+
+class Properties(dict):
+    pass
+
+
+def obs_properties_create():
+    return Properties()
+
+def _add_property(props, name, *args):
+    props[name] = args
+    return name
+
+obs_properties_add_text = _add_property
+obs_properties_add_int = _add_property
+obs_properties_add_bool = _add_property
+obs_properties_add_list = _add_property
+obs_properties_add_button = _add_property
+obs_properties_add_path = _add_property
+obs_properties_add_editable_list = _add_property
+obs_properties_add_group = _add_property
+
+def obs_properties_get(props, name):
+    return name
+
+def obs_property_name(prop):
+    return prop
+
+def obs_properties_destroy(props):
+    pass
+
+def obs_source_properties(source):
+    return Properties(refreshnocache=())
+
+def obs_property_button_clicked(prop, obj):
+    _count('obs_property_button_clicked')
+    if prop == "refreshnocache" and isinstance(obj, Source):
+        obj.refreshes += 1
+    return False
+
+def obs_property_list_add_string(prop, name, value):
+    pass
+
+def obs_property_set_long_description(prop, description):
+    pass
+
+def obs_property_set_visible(prop, visible):
+    pass
+
+def obs_property_set_modified_callback(prop, callback):
+    pass
+
+
+# signals
+
+def obs_get_signal_handler():
+    return signal_handlers
+
+def signal_handler_connect(handler, signal, callback):
+    handler[signal].append(callback)
+
+def signal_handler_disconnect(handler, signal, callback):
+    if callback in handler[signal]:
+        handler[signal].remove(callback)
+
+def calldata_source(calldata, name):
+    return calldata.get(name)
+
+def calldata_string(calldata, name):
+    return calldata.get(name)
+
+
+# timers, hotkeys, frontend
+
+def timer_add(callback, milliseconds):
+    timers.append((callback, milliseconds))
+
+def timer_remove(callback):
+    timers[:] = [timer for timer in timers if timer[0] is not callback]
+
+def run_timers():
+    """ fire every registered timer once, like a tick of the OBS main loop would """
+    for callback, _ in list(timers):
+        callback()
+
+def obs_hotkey_register_frontend(name, description, callback):
+    return len(name)
+
+def obs_hotkey_load(hotkey_id, array):
+    pass
+
+def obs_hotkey_save(hotkey_id):
+    return []
+
+def obs_frontend_add_event_callback(callback):
+    frontend_callbacks.append(callback)
+
+def obs_frontend_streaming_active():
+    return streaming
+
+def script_log(level, message):
+    # stderr, so benchmark JSON on stdout stays parseable
+    print(message, file=sys.stderr)
@@ -1,13 +1,71 @@
 import obspython as obs
 
+import time
+_SCRIPT_IMPORT_STARTED = time.perf_counter()
+
+import os
+import re
 import json
-import datetime as dt
+import queue
+import random
+import sqlite3
+import hashlib
+import difflib
+import unicodedata
+import tempfile
+import importlib
+import threading
+import socketserver
+import http.server
+from array import array
+from collections import namedtuple
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
+
+from script_common import SourceIndex
+
+
+class LazyModule(object):
+    """ stand-in for a heavy module that only gets imported the first time something touches it """
+
+    # module name -> seconds it took to import
+    import_times = {}
+
+    def __init__(self, name):
+        self._name = name
+        self._module = None
+
+    def load(self):
+        if self._module is None:
+            started = time.perf_counter()
+            module = importlib.import_module(self._name)
+            LazyModule.import_times[self._name] = time.perf_counter() - started
+            self._module = module
+        return self._module
 
-from jinja2 import Environment, FunctionLoader, select_autoescape
+    def __getattr__(self, attr):
+        return getattr(self.load(), attr)
 
-from twitchAPI.twitch import Twitch
-from igdb.wrapper import IGDBWrapper
 
+# jinja2 and requests (plus everything they pull in) are slow to import, and OBS loads
+# scripts on its UI thread - so they're loaded on first use, or pre-warmed after script_load
+requests = LazyModule('requests')
+jinja2 = LazyModule('jinja2')
+
+
+# where the script keeps its on-disk caches (IGDB responses, Twitch credentials, etc.)
+CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "gameinfo_cache")
+
+TWITCH_TOKEN_URL = "https://id.twitch.tv/oauth2/token"
+TWITCH_HELIX_URL = "https://api.twitch.tv/helix/"
+IGDB_API_URL = "https://api.igdb.com/v4/"
+IGDB_IMAGE_URL = "https://images.igdb.com/igdb/image/upload/t_{size}/{image_id}.jpg"
+
+# returned by a category check when the Twitch category is the same as last time
+CATEGORY_UNCHANGED = object()
+
+# 1x1 transparent gif, shown while the real cover art is still downloading
+COVER_PLACEHOLDER = "data:image/gif;base64,R0lGODlhAQABAIAAAAAAAP///yH5BAEAAAAALAAAAAABAAEAAAIBRAA7"
 
 default_template = """
 <!DOCTYPE html>
@@ -20,21 +78,1296 @@ default_template = """
     </head>
     <body>
         <!-- see https://jinja.palletsprojects.com/en/2.11.x/templates/ for more info -->
-        <p>{{ game_info.game_name }}</p>
-        <img src="{{ game_info.game_cover }}" />
-        <p>Platforms: {{ game_info.platforms }}</p>
+        <!-- data-gameinfo="<field>" marks elements that live updates (if enabled) keep in sync -->
+        <p data-gameinfo="game_name">{{ game_info.game_name }}</p>
+        <img data-gameinfo="game_cover" src="{{ game_info.game_cover }}" />
+        <p>Platforms: <span data-gameinfo="platforms">{{ game_info.platforms }}</span></p>
         <p>Developers:</p>
+        <div data-gameinfo="developers">
         {% for developer in game_info.developers %}
         <p>{{ developer }}</p>
         {% endfor %}
+        </div>
         <p>Publishers:</p>
+        <div data-gameinfo="publishers">
         {% for publisher in game_info.publishers %}
         <p>{{ publisher }}</p>
         {% endfor %}
+        </div>
     </body>
 </html>
 """
 
+class IGDBCache(object):
+    """ sqlite-backed cache of raw IGDB responses, keyed by normalized game name """
+
+    def __init__(self, path, ttl=7 * 24 * 3600, miss_ttl=3600, stale_ttl=30 * 24 * 3600, max_entries=500, stale_while_revalidate=True):
+        self.path = path
+        self.ttl = ttl
+        self.miss_ttl = miss_ttl
+        self.stale_ttl = stale_ttl
+        self.max_entries = max_entries
+        self.stale_while_revalidate = stale_while_revalidate
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self._db = None
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def normalize_key(name):
+        """ case- and whitespace-insensitive cache key for a game name """
+        return " ".join(name.casefold().split())
+
+    def _connect(self):
+        if self._db is None:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            self._db = sqlite3.connect(self.path, check_same_thread=False)
+            self._db.execute(
+                'CREATE TABLE IF NOT EXISTS igdb_games ('
+                'key TEXT PRIMARY KEY, payload TEXT NOT NULL, expires_at REAL NOT NULL, last_access REAL NOT NULL)'
+            )
+            self._db.execute('CREATE INDEX IF NOT EXISTS igdb_games_lru ON igdb_games (last_access)')
+        return self._db
+
+    def get(self, name):
+        """ returns (payload, is_stale), or (None, False) if there's nothing usable cached """
+        key = self.normalize_key(name)
+        now = time.time()
+
+        with self._lock:
+            db = self._connect()
+            row = db.execute('SELECT payload, expires_at FROM igdb_games WHERE key = ?', (key,)).fetchone()
+
+            # expired entries are only good for stale-while-revalidate, and only for so long
+            stale = row is not None and now >= row[1]
+            if row is None or (stale and (not self.stale_while_revalidate or now >= row[1] + self.stale_ttl)):
+                self.misses += 1
+                return None, False
+
+            db.execute('UPDATE igdb_games SET last_access = ? WHERE key = ?', (now, key))
+            db.commit()
+
+            if stale:
+                self.stale_hits += 1
+            else:
+                self.hits += 1
+
+        return json.loads(row[0]), stale
+
+    def put(self, name, payload, ttl=None):
+        """ store an IGDB response, evicting the least recently used entries past max_entries """
+        if ttl is None:
+            # don't hang on to "no such game" for as long as a real answer
+            ttl = self.ttl if len(payload) > 0 else self.miss_ttl
+
+        now = time.time()
+        with self._lock:
+            db = self._connect()
+            db.execute(
+                'INSERT OR REPLACE INTO igdb_games (key, payload, expires_at, last_access) VALUES (?, ?, ?, ?)',
+                (self.normalize_key(name), json.dumps(payload, separators=(',', ':')), now + ttl, now)
+            )
+            db.execute(
+                'DELETE FROM igdb_games WHERE key IN (SELECT key FROM igdb_games ORDER BY last_access DESC LIMIT -1 OFFSET ?)',
+                (self.max_entries,)
+            )
+            db.commit()
+
+    def stats(self):
+        """ hit/miss counters plus the current entry count """
+        with self._lock:
+            entries = self._connect().execute('SELECT COUNT(*) FROM igdb_games').fetchone()[0]
+
+        lookups = self.hits + self.stale_hits + self.misses
+        return {
+            'hits':         self.hits,
+            'stale_hits':   self.stale_hits,
+            'misses':       self.misses,
+            'hit_rate':     (self.hits + self.stale_hits) / lookups if lookups else 0.0,
+            'entries':      entries
+        }
+
+    def close(self):
+        with self._lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
+
+
+class _NullStage(object):
+    """ what StageTimings.stage() hands out while timing is switched off """
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+_NULL_STAGE = _NullStage()
+
+
+class _Stage(object):
+    def __init__(self, timings, name):
+        self.timings = timings
+        self.name = name
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.timings.record(self.name, time.perf_counter() - self.started)
+        return False
+
+
+class StageTimings(object):
+    """ rolling latency samples for each pipeline stage, kept in fixed-size ring buffers """
+
+    STAGES = ('auth', 'user_lookup', 'channel_info', 'igdb_query', 'json_decode', 'normalize', 'render', 'source_update')
+
+    def __init__(self, size=512):
+        self.enabled = False
+        self.size = size
+        self._rings = {}
+        self._lock = threading.Lock()
+
+    def stage(self, name):
+        """ context manager timing one run of a stage; free when timing is disabled """
+        if not self.enabled:
+            return _NULL_STAGE
+        return _Stage(self, name)
+
+    def record(self, name, seconds):
+        with self._lock:
+            ring = self._rings.get(name)
+            if ring is None:
+                # [samples, next slot, total count, total seconds]
+                ring = self._rings[name] = [array('d', bytes(8 * self.size)), 0, 0, 0.0]
+            ring[0][ring[1]] = seconds
+            ring[1] = (ring[1] + 1) % self.size
+            ring[2] += 1
+            ring[3] += seconds
+
+    def summary(self):
+        """ {stage: {'count', 'sum', 'p50', 'p95', 'p99', 'max'}}, percentiles over the most recent samples """
+        with self._lock:
+            rings = [(name, sorted(ring[0][:min(ring[2], self.size)]), ring[2], ring[3]) for name, ring in self._rings.items()]
+
+        order = {name: i for i, name in enumerate(self.STAGES)}
+        summary = {}
+        for name, samples, count, total in sorted(rings, key=lambda r: order.get(r[0], len(order))):
+            summary[name] = {
+                'count':    count,
+                'sum':      total,
+                'p50':      samples[int(0.50 * (len(samples) - 1))],
+                'p95':      samples[int(0.95 * (len(samples) - 1))],
+                'p99':      samples[int(0.99 * (len(samples) - 1))],
+                'max':      samples[-1]
+            }
+        return summary
+
+    def report(self):
+        """ human-readable table for the script log """
+        lines = ["{:<14} {:>7} {:>9} {:>9} {:>9} {:>9}".format('stage', 'count', 'p50 ms', 'p95 ms', 'p99 ms', 'max ms')]
+        for name, s in self.summary().items():
+            lines.append("{:<14} {:>7} {:>9.1f} {:>9.1f} {:>9.1f} {:>9.1f}".format(
+                name, s['count'], s['p50'] * 1000, s['p95'] * 1000, s['p99'] * 1000, s['max'] * 1000
+            ))
+        return "\n".join(lines)
+
+    def prometheus(self):
+        """ the same numbers in Prometheus text exposition format """
+        lines = [
+            "# HELP gameinfo_stage_seconds Time spent in each stage of the gameinfo pipeline.",
+            "# TYPE gameinfo_stage_seconds summary"
+        ]
+        for name, s in self.summary().items():
+            for quantile, key in (('0.5', 'p50'), ('0.95', 'p95'), ('0.99', 'p99')):
+                lines.append('gameinfo_stage_seconds{{stage="{}",quantile="{}"}} {:.6f}'.format(name, quantile, s[key]))
+            lines.append('gameinfo_stage_seconds_sum{{stage="{}"}} {:.6f}'.format(name, s['sum']))
+            lines.append('gameinfo_stage_seconds_count{{stage="{}"}} {}'.format(name, s['count']))
+        return "\n".join(lines) + "\n"
+
+
+class HttpSession(object):
+    """ long-lived keep-alive connection pool, shared by every Twitch/IGDB request """
+
+    def __init__(self, timeout=10, pool_size=8):
+        self.timeout = timeout
+        self.pool_size = pool_size
+        self._session = None
+        self._lock = threading.Lock()
+
+    def open(self):
+        with self._lock:
+            if self._session is None:
+                session = requests.Session()
+                adapter = requests.adapters.HTTPAdapter(pool_connections=4, pool_maxsize=self.pool_size)
+                session.mount('https://', adapter)
+                session.mount('http://', adapter)
+                session.headers['Accept-Encoding'] = 'gzip, deflate'
+                self._session = session
+            return self._session
+
+    def request(self, method, url, **kwargs):
+        kwargs.setdefault('timeout', self.timeout)
+        return self.open().request(method, url, **kwargs)
+
+    def get(self, url, **kwargs):
+        return self.request('GET', url, **kwargs)
+
+    def post(self, url, **kwargs):
+        return self.request('POST', url, **kwargs)
+
+    def close(self):
+        with self._lock:
+            if self._session is not None:
+                self._session.close()
+                self._session = None
+
+
+class RequestFailed(Exception):
+    """ a scheduled request gave up (out of retries, or the API's circuit breaker is open) """
+    pass
+
+
+class TokenBucket(object):
+    """ classic token bucket: `rate` requests per second, with bursts of up to `burst` """
+
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = burst
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """ block until a request is allowed """
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+
+                if now < self._paused_until:
+                    wait = self._paused_until - now
+                elif self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                else:
+                    wait = (1 - self._tokens) / self.rate
+
+            time.sleep(wait)
+
+    def pause(self, seconds):
+        """ hold everybody off for a while (e.g. the API told us to back off) """
+        with self._lock:
+            self._tokens = 0.0
+            self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+
+
+class ApiLimits(object):
+    """ per-API throttling state: rate limit, concurrency cap and circuit breaker """
+
+    # open the breaker after this many failures in a row, and leave it open this long
+    FAILURE_THRESHOLD = 5
+    OPEN_SECONDS = 60
+
+    def __init__(self, name, rate, burst, max_concurrent):
+        self.name = name
+        self.bucket = TokenBucket(rate, burst)
+        self.concurrency = threading.BoundedSemaphore(max_concurrent)
+        self.failures = 0
+        self.open_until = 0.0
+        self._lock = threading.Lock()
+
+    def allow(self):
+        """ False while the circuit breaker is open; once it times out, a single trial request gets through """
+        with self._lock:
+            now = time.monotonic()
+            if now < self.open_until:
+                return False
+            if self.failures >= self.FAILURE_THRESHOLD:
+                # half-open: let this request through, but keep everyone else out until we hear back
+                self.open_until = now + self.OPEN_SECONDS
+            return True
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.open_until = 0.0
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.failures >= self.FAILURE_THRESHOLD:
+                self.open_until = time.monotonic() + self.OPEN_SECONDS
+
+
+class RequestScheduler(object):
+    """ every Twitch/IGDB request goes through here, so they all share rate limits, backoff and breakers """
+
+    RETRIES = 3
+    BACKOFF_BASE = 0.5
+    BACKOFF_MAX = 30.0
+
+    def __init__(self):
+        self.apis = {}
+        self._inflight = {}
+        self._lock = threading.Lock()
+
+    def add_api(self, name, rate, burst, max_concurrent):
+        self.apis[name] = ApiLimits(name, rate, burst, max_concurrent)
+
+    def call(self, api, key, fn):
+        """ run fn() under api's limits, retrying transient failures.
+
+        Identical requests (same key) that are already in flight are coalesced: the
+        caller just waits for the running one and gets the same result.
+        """
+        with self._lock:
+            inflight = self._inflight.get(key)
+            owner = inflight is None
+            if owner:
+                inflight = self._inflight[key] = {'done': threading.Event(), 'result': None, 'error': None}
+
+        if not owner:
+            inflight['done'].wait()
+            if inflight['error'] is not None:
+                raise inflight['error']
+            return inflight['result']
+
+        try:
+            inflight['result'] = self._call(self.apis[api], fn)
+            return inflight['result']
+        except Exception as e:
+            inflight['error'] = e
+            raise
+        finally:
+            with self._lock:
+                del self._inflight[key]
+            inflight['done'].set()
+
+    def _call(self, limits, fn):
+        attempt = 0
+        while True:
+            if not limits.allow():
+                raise RequestFailed("{} is failing, not calling it for a while".format(limits.name))
+
+            limits.bucket.acquire()
+            with limits.concurrency:
+                try:
+                    result = fn()
+                except requests.HTTPError as e:
+                    status = e.response.status_code if e.response is not None else None
+                    if status != 429 and (status is None or status < 500):
+                        # our fault (bad credentials, bad query, ...) - retrying won't help
+                        limits.record_success()
+                        raise
+                    error, delay = "HTTP {}".format(status), self.retry_delay(e.response, attempt)
+                except (requests.ConnectionError, requests.Timeout) as e:
+                    error, delay = repr(e), self.retry_delay(None, attempt)
+                else:
+                    limits.record_success()
+                    self.honor_rate_limit(limits, getattr(result, 'headers', None))
+                    return result
+
+            limits.record_failure()
+            if attempt >= self.RETRIES:
+                raise RequestFailed("{} request failed: {}".format(limits.name, error))
+
+            limits.bucket.pause(delay)
+            attempt += 1
+
+    def retry_delay(self, response, attempt):
+        """ what the server asked for (Retry-After / Ratelimit-Reset), else full-jitter exponential backoff """
+        headers = response.headers if response is not None else {}
+        if 'Retry-After' in headers:
+            try:
+                return min(self.BACKOFF_MAX, float(headers['Retry-After']))
+            except ValueError:
+                pass
+        if 'Ratelimit-Reset' in headers:
+            try:
+                return min(self.BACKOFF_MAX, max(0.0, float(headers['Ratelimit-Reset']) - time.time()))
+            except ValueError:
+                pass
+        return random.uniform(0, min(self.BACKOFF_MAX, self.BACKOFF_BASE * 2 ** attempt))
+
+    @staticmethod
+    def honor_rate_limit(limits, headers):
+        """ Twitch tells us how many requests we have left; if that's none, wait for the bucket to refill """
+        if not headers or headers.get('Ratelimit-Remaining') != '0' or 'Ratelimit-Reset' not in headers:
+            return
+        try:
+            limits.bucket.pause(max(0.0, float(headers['Ratelimit-Reset']) - time.time()))
+        except ValueError:
+            pass
+
+
+class GameIndex(object):
+    """ local fuzzy index of IGDB names, slugs and alternative names -> game ID.
+
+    Every game we settle on gets added (and persisted to sqlite), so names we've seen
+    before resolve to an ID without a search round trip.  Alternative names never
+    replace a game's own name or slug (FF VI is also "Final Fantasy III"), and fuzzy
+    matches have to agree on sequel numbers, so "Final Fantasy VII" can't land on VI.
+    """
+
+    # how alike (trigram Jaccard similarity, 0..1) a name has to be to count as a match
+    MATCH_THRESHOLD = 0.6
+    ROMAN_NUMERAL = re.compile(r'^(?=[ivxlc])c{0,3}(xc|xl|l?x{0,3})(ix|iv|v?i{0,3})$')
+    ROMAN_VALUES = {'i': 1, 'v': 5, 'x': 10, 'l': 50, 'c': 100}
+
+    def __init__(self, path):
+        self.path = path
+        self._db = None
+        self._names = None
+        self._aliases = set()
+        self._trigrams = {}
+        self._trigram_counts = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def normalize(name):
+        """ accents, case and punctuation stripped, so "Pokémon: Red" and "pokemon-red" compare equal """
+        name = unicodedata.normalize('NFKD', name).encode('ascii', 'ignore').decode('ascii')
+        return re.sub(r'[^a-z0-9]+', ' ', name.casefold().replace("'", "")).strip()
+
+    @staticmethod
+    def trigrams(normalized):
+        padded = "  {} ".format(normalized)
+        return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+    @classmethod
+    def numbers(cls, normalized):
+        """ the sequel numbers in a normalized name, roman numerals included: "final fantasy vii 2" -> {7, 2}
+
+        A name doesn't start with its sequel number, so a leading roman-numeral-looking
+        word is just a word ("I Am Bread", "Civ VI").
+        """
+        numbers = set()
+        for position, token in enumerate(normalized.split()):
+            if token.isdigit():
+                numbers.add(int(token))
+            elif position > 0 and cls.ROMAN_NUMERAL.match(token):
+                values = [cls.ROMAN_VALUES[c] for c in token]
+                numbers.add(sum(-v if v < n else v for v, n in zip(values, values[1:] + [0])))
+        return numbers
+
+    def _load(self):
+        """ (call with the lock held) open the database and build the in-memory index from it """
+        if self._names is None:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            self._db = sqlite3.connect(self.path, check_same_thread=False)
+            self._db.execute('CREATE TABLE IF NOT EXISTS game_names (name TEXT PRIMARY KEY, game_id INTEGER NOT NULL, alias INTEGER NOT NULL)')
+            self._names = {}
+            for name, game_id, alias in self._db.execute('SELECT name, game_id, alias FROM game_names'):
+                self._index(name, game_id, alias)
+
+    def _index(self, normalized, game_id, alias):
+        self._names[normalized] = game_id
+        if alias:
+            self._aliases.add(normalized)
+        else:
+            self._aliases.discard(normalized)
+        trigrams = self.trigrams(normalized)
+        self._trigram_counts[normalized] = len(trigrams)
+        for trigram in trigrams:
+            self._trigrams.setdefault(trigram, set()).add(normalized)
+
+    def add_games(self, games):
+        """ index the name, slug and alternative names of each IGDB game record """
+        rows = []
+        for game in games:
+            if 'id' not in game:
+                continue
+            for name in (game.get('name'), game.get('slug')):
+                if name:
+                    rows.append((self.normalize(name), game['id'], False))
+            for alt in game.get('alternative_names', []):
+                if alt.get('name'):
+                    rows.append((self.normalize(alt['name']), game['id'], True))
+
+        with self._lock:
+            self._load()
+            new_rows = []
+            for name, game_id, alias in rows:
+                if not name:
+                    continue
+                known = name in self._names
+                if alias and known and name not in self._aliases:
+                    # some game's real name; an alias doesn't get to take it over
+                    continue
+                if known and self._names[name] == game_id and alias == (name in self._aliases):
+                    continue
+                self._index(name, game_id, alias)
+                new_rows.append((name, game_id, alias))
+            if new_rows:
+                self._db.executemany('INSERT OR REPLACE INTO game_names (name, game_id, alias) VALUES (?, ?, ?)', new_rows)
+                self._db.commit()
+
+    def import_file(self, path):
+        """ bulk-load a JSON dump of IGDB games (a list of {id, name, slug, alternative_names: [{name}]}) """
+        with open(path, 'r', encoding='utf-8') as f:
+            games = json.load(f)
+        self.add_games(games)
+        return len(games)
+
+    def resolve(self, name, fuzzy=False):
+        """ game ID for name, or None.
+
+        By default only a game's own name or slug counts; with fuzzy, alternative names and
+        the closest trigram match (with the same sequel numbers) do too.
+        """
+        normalized = self.normalize(name)
+        if not normalized:
+            return None
+
+        with self._lock:
+            self._load()
+            game_id = self._names.get(normalized)
+            if game_id is not None and (fuzzy or normalized not in self._aliases):
+                return game_id
+            if not fuzzy:
+                return None
+
+            # count shared trigrams per candidate, then score by Jaccard similarity
+            wanted = self.trigrams(normalized)
+            shared = {}
+            for trigram in wanted:
+                for candidate in self._trigrams.get(trigram, ()):
+                    shared[candidate] = shared.get(candidate, 0) + 1
+
+            best, best_score = None, self.MATCH_THRESHOLD
+            trigram_counts = self._trigram_counts
+            numbers = self.numbers(normalized)
+            for candidate, count in shared.items():
+                score = count / (len(wanted) + trigram_counts[candidate] - count)
+                if score > best_score and self.numbers(candidate) == numbers:
+                    best, best_score = candidate, score
+
+            if best is None:
+                # abbreviations ("civ vi" for "civilization vi") share too few trigrams; take the candidate
+                # with the same words, each one starting with the word typed in its place
+                words = normalized.split()
+                for candidate in sorted(shared, key=shared.get, reverse=True):
+                    candidate_words = candidate.split()
+                    if len(candidate_words) != len(words) or self.numbers(candidate) != numbers:
+                        continue
+                    if all(c.startswith(w) for w, c in zip(words, candidate_words)):
+                        best = candidate
+                        break
+
+            return self._names[best] if best is not None else None
+
+    def close(self):
+        with self._lock:
+            if self._db is not None:
+                self._db.close()
+            self._db = None
+            self._names = None
+            self._aliases = set()
+            self._trigrams = {}
+            self._trigram_counts = {}
+
+
+class TwitchCredentialCache(object):
+    """ persists the Twitch app token (and its expiry) plus username -> broadcaster ID lookups """
+
+    # mint a new app token this long before Twitch says the old one expires
+    REFRESH_MARGIN = 24 * 3600
+
+    def __init__(self, path):
+        self.path = path
+        self._data = None
+        self._lock = threading.Lock()
+
+    def _load(self):
+        if self._data is None:
+            try:
+                with open(self.path, 'r') as f:
+                    self._data = json.load(f)
+            except (OSError, ValueError):
+                self._data = {}
+            self._data.setdefault('app_tokens', {})
+            self._data.setdefault('broadcaster_ids', {})
+        return self._data
+
+    def _save(self):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(self._data, f)
+        os.replace(tmp_path, self.path)
+
+    def get_app_token(self, client_id, fetch):
+        """ return a cached app token; fetch() (returning Twitch's token response) is called if it's missing or about to expire """
+        with self._lock:
+            entry = self._load()['app_tokens'].get(client_id)
+            if entry is not None and time.time() < entry['expires_at'] - self.REFRESH_MARGIN:
+                return entry['access_token']
+
+        token = fetch()
+
+        with self._lock:
+            self._load()['app_tokens'][client_id] = {
+                'access_token': token['access_token'],
+                'expires_at': time.time() + token['expires_in']
+            }
+            self._save()
+
+        return token['access_token']
+
+    def invalidate_app_token(self, client_id):
+        """ forget the app token for client_id (e.g. because Twitch rejected it) """
+        with self._lock:
+            if self._load()['app_tokens'].pop(client_id, None) is not None:
+                self._save()
+
+    def get_broadcaster_id(self, username, fetch):
+        """ memoized username -> broadcaster ID; fetch(username) is only called on a miss """
+        key = username.casefold()
+        with self._lock:
+            broadcaster_id = self._load()['broadcaster_ids'].get(key)
+        if broadcaster_id is not None:
+            return broadcaster_id
+
+        broadcaster_id = fetch(username)
+        with self._lock:
+            self._load()['broadcaster_ids'][key] = broadcaster_id
+            self._save()
+
+        return broadcaster_id
+
+
+class CoverCache(object):
+    """ local mirror of IGDB cover art, stored under content-addressed filenames """
+
+    def __init__(self, path, http, max_bytes=64 * 1024 * 1024, workers=2):
+        self.path = path
+        self.http = http
+        self.max_bytes = max_bytes
+        self.workers = workers
+        self._index = None
+        self._pending = {}
+        self._pool = None
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(image_id, size):
+        return "{}/{}".format(size, image_id)
+
+    def _load_index(self):
+        # index maps "size/image_id" -> {'file': <sha1>.jpg, 'bytes': n, 'last_access': t}
+        if self._index is None:
+            try:
+                with open(os.path.join(self.path, 'index.json'), 'r') as f:
+                    self._index = json.load(f)
+            except (OSError, ValueError):
+                self._index = {}
+        return self._index
+
+    def _save_index(self):
+        os.makedirs(self.path, exist_ok=True)
+        tmp_path = os.path.join(self.path, 'index.json.tmp')
+        with open(tmp_path, 'w') as f:
+            json.dump(self._index, f)
+        os.replace(tmp_path, os.path.join(self.path, 'index.json'))
+
+    def get(self, image_id, size):
+        """ file:// URL of the mirrored image, or None if we don't have it yet """
+        with self._lock:
+            entry = self._load_index().get(self._key(image_id, size))
+            if entry is None:
+                return None
+
+            file_path = os.path.join(self.path, entry['file'])
+            if not os.path.exists(file_path):
+                del self._index[self._key(image_id, size)]
+                return None
+
+            entry['last_access'] = time.time()
+
+        return Path(file_path).as_uri()
+
+    def fetch(self, image_id, sizes, callback=None):
+        """ download any of the given sizes we don't already have on the background pool.
+
+        callback(image_id, size) is called from the pool thread as each download lands.
+        """
+        with self._lock:
+            if self._pool is None:
+                self._pool = ThreadPoolExecutor(max_workers=self.workers)
+
+            for size in sizes:
+                key = self._key(image_id, size)
+                if key in self._load_index() or key in self._pending:
+                    continue
+                self._pending[key] = self._pool.submit(self._download, image_id, size, callback)
+
+    def _download(self, image_id, size, callback):
+        key = self._key(image_id, size)
+        try:
+            response = self.http.get(IGDB_IMAGE_URL.format(size=size, image_id=image_id))
+            response.raise_for_status()
+            content = response.content
+
+            # content-addressed, so the same image under two keys is only stored once
+            file_name = hashlib.sha1(content).hexdigest() + '.jpg'
+            file_path = os.path.join(self.path, file_name)
+            if not os.path.exists(file_path):
+                os.makedirs(self.path, exist_ok=True)
+                tmp_path = file_path + '.tmp'
+                with open(tmp_path, 'wb') as f:
+                    f.write(content)
+                os.replace(tmp_path, file_path)
+
+            with self._lock:
+                self._load_index()[key] = {'file': file_name, 'bytes': len(content), 'last_access': time.time()}
+                self._evict()
+                self._save_index()
+        except Exception as e:
+            print("gameinfo: couldn't download cover {}: {}".format(key, e))
+            return
+        finally:
+            with self._lock:
+                self._pending.pop(key, None)
+
+        if callback is not None:
+            callback(image_id, size)
+
+    def _evict(self):
+        """ drop least recently used images until we're under max_bytes (call with the lock held) """
+        files = {}
+        for entry in self._index.values():
+            files[entry['file']] = entry['bytes']
+        total = sum(files.values())
+        if total <= self.max_bytes:
+            return
+
+        for key, entry in sorted(self._index.items(), key=lambda i: i[1]['last_access']):
+            if total <= self.max_bytes:
+                break
+            del self._index[key]
+            if not any(e['file'] == entry['file'] for e in self._index.values()):
+                total -= entry['bytes']
+                try:
+                    os.unlink(os.path.join(self.path, entry['file']))
+                except OSError:
+                    pass
+
+    def close(self):
+        with self._lock:
+            pool = self._pool
+            self._pool = None
+        if pool is not None:
+            pool.shutdown(wait=False)
+        with self._lock:
+            if self._index is not None:
+                self._save_index()
+
+
+class FetchWorker(object):
+    """ runs lookups on a background thread and hands the results back to the OBS thread """
+
+    def __init__(self):
+        self._jobs = queue.Queue()
+        self._results = queue.Queue()
+        self._generation = 0
+        self._running = False
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="gameinfo-fetch", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        if self._thread is not None:
+            self.cancel()
+            self._jobs.put(None)
+            self._thread.join(5)
+            self._thread = None
+
+    def submit(self, job, callback):
+        """ queue job(cancelled) to run off-thread, superseding anything submitted before it.
+
+        job should check cancelled() between slow steps and give up if it returns True.
+        callback(result) runs on the OBS thread (see poll()), and only if the job wasn't superseded.
+        """
+        self.start()
+        with self._lock:
+            self._generation += 1
+            generation = self._generation
+        self._jobs.put((generation, job, callback))
+
+    def cancel(self):
+        """ supersede whatever is queued or in flight without submitting anything new """
+        with self._lock:
+            self._generation += 1
+
+    def is_current(self, generation):
+        with self._lock:
+            return generation == self._generation
+
+    def idle(self):
+        """ True if nothing is queued or running """
+        return not self._running and self._jobs.empty()
+
+    def _run(self):
+        while True:
+            item = self._jobs.get()
+            if item is None:
+                return
+
+            generation, job, callback = item
+            if not self.is_current(generation):
+                # superseded before we even got to it
+                continue
+
+            self._running = True
+            try:
+                result = job(lambda: not self.is_current(generation))
+            except Exception as e:
+                print("gameinfo: background fetch failed: {}".format(e))
+                continue
+            finally:
+                self._running = False
+
+            self._results.put((generation, callback, result))
+
+    def post(self, callback, *args):
+        """ run callback(*args) on the OBS thread at the next poll(), from any thread """
+        self._results.put((None, lambda _: callback(*args), None))
+
+    def poll(self):
+        """ run callbacks for finished jobs; call this from the OBS thread """
+        while True:
+            try:
+                generation, callback, result = self._results.get_nowait()
+            except queue.Empty:
+                return
+
+            if generation is None or self.is_current(generation):
+                callback(result)
+
+
+class CategoryPoller(object):
+    """ obs.timer_add loop that watches the channel's category, polling faster when it's likely to change """
+
+    # seconds between checks: quick right after the stream starts or the category changes,
+    # then backing off towards MAX_INTERVAL while it stays put
+    FAST_INTERVAL = 10
+    FAST_WINDOW = 300
+    SLOW_INTERVAL = 60
+    MAX_INTERVAL = 300
+    BACKOFF = 1.5
+
+    def __init__(self, check):
+        self.check = check
+        self.streaming = False
+        self.poll_offline = False
+        self.interval = None
+        self._fast_until = 0.0
+        # OBS matches timers by identity, so hang on to a single bound method
+        self._tick_callback = self._tick
+
+    def _tick(self):
+        self.check()
+
+    def _schedule(self, interval):
+        if interval == self.interval:
+            return
+        if self.interval is not None:
+            obs.timer_remove(self._tick_callback)
+        if interval is not None:
+            obs.timer_add(self._tick_callback, int(interval * 1000))
+        self.interval = interval
+
+    def start(self, streaming):
+        self.streaming = streaming
+        self._fast_until = time.monotonic() + self.FAST_WINDOW
+        self._schedule(self.FAST_INTERVAL if self.active() else None)
+
+    def stop(self):
+        self._schedule(None)
+
+    def active(self):
+        return self.streaming or self.poll_offline
+
+    def set_streaming(self, streaming):
+        """ frontend event hook: speed up when the stream starts, stop polling when it ends """
+        if streaming != self.streaming:
+            self.start(streaming)
+
+    def changed(self):
+        self._fast_until = time.monotonic() + self.FAST_WINDOW
+        if self.active():
+            self._schedule(self.FAST_INTERVAL)
+
+    def unchanged(self):
+        if not self.active():
+            return
+        if time.monotonic() < self._fast_until:
+            self._schedule(self.FAST_INTERVAL)
+        else:
+            self._schedule(min(self.MAX_INTERVAL, max(self.SLOW_INTERVAL, (self.interval or 0) * self.BACKOFF)))
+
+
+LIVE_UPDATE_CLIENT_JS = """
+// gameinfo live updates: applies game_info changes pushed by the gameinfo script
+(function () {
+    function apply(game_info, changed) {
+        Object.keys(changed).forEach(function (field) {
+            var value = changed[field];
+            document.querySelectorAll('[data-gameinfo="' + field + '"]').forEach(function (el) {
+                if (el.tagName === 'IMG') {
+                    el.src = value || '';
+                } else if (Array.isArray(value)) {
+                    // one child per item, cloned from the first child (or a <p> if there isn't one)
+                    var proto = el.firstElementChild ? el.firstElementChild.cloneNode(false) : document.createElement('p');
+                    el.textContent = '';
+                    value.forEach(function (item) {
+                        var child = proto.cloneNode(false);
+                        child.textContent = typeof item === 'object' ? Object.values(item).join(' ') : item;
+                        el.appendChild(child);
+                    });
+                } else {
+                    el.textContent = value === null || value === undefined ? '' : value;
+                }
+            });
+        });
+        document.dispatchEvent(new CustomEvent('gameinfo', {detail: {game_info: game_info, changed: changed}}));
+    }
+
+    var game_info = {};
+    var events = new EventSource('/events');
+    events.addEventListener('snapshot', function (e) {
+        var snapshot = JSON.parse(e.data);
+        if (snapshot === null) {
+            // no game (not on IGDB, lookup failed, ...): blank every field the page shows, like file mode renders it
+            var cleared = {};
+            document.querySelectorAll('[data-gameinfo]').forEach(function (el) {
+                cleared[el.getAttribute('data-gameinfo')] = null;
+            });
+            game_info = {};
+            apply(game_info, cleared);
+        } else {
+            game_info = snapshot;
+            apply(game_info, game_info);
+        }
+    });
+    events.addEventListener('delta', function (e) {
+        var changed = JSON.parse(e.data);
+        Object.keys(changed).forEach(function (field) { game_info[field] = changed[field]; });
+        apply(game_info, changed);
+    });
+})();
+"""
+
+
+class _ThreadingHTTPServer(socketserver.ThreadingMixIn, http.server.HTTPServer):
+    daemon_threads = True
+
+
+class _LiveUpdateHandler(http.server.BaseHTTPRequestHandler):
+    """ /panel/<name> serves a rendered page (/ is the first one), /events streams game_info deltas, /covers/* serves mirrored cover art """
+
+    HEARTBEAT_SECONDS = 15
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        live = self.server.live
+        path = self.path.split('?', 1)[0]
+
+        page = live.get_page(path)
+        if page is not None:
+            self._send(200, 'text/html; charset=utf-8', page.encode('utf-8'))
+        elif path == '/gameinfo.js':
+            self._send(200, 'application/javascript', LIVE_UPDATE_CLIENT_JS.encode('utf-8'))
+        elif path == '/events':
+            self._stream_events(live)
+        elif re.match(r'^/covers/[0-9a-f]{40}\.jpg$', path):
+            try:
+                with open(os.path.join(live.cover_dir, path[len('/covers/'):]), 'rb') as f:
+                    self._send(200, 'image/jpeg', f.read())
+            except OSError:
+                self._send(404, 'text/plain', b'not found')
+        else:
+            self._send(404, 'text/plain', b'not found')
+
+    def _send(self, status, content_type, body):
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.send_header('Cache-Control', 'no-cache')
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _stream_events(self, live):
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/event-stream')
+        self.send_header('Cache-Control', 'no-cache')
+        self.end_headers()
+
+        client = live.subscribe()
+        try:
+            while True:
+                try:
+                    message = client.get(timeout=self.HEARTBEAT_SECONDS)
+                except queue.Empty:
+                    message = b': keep-alive\n\n'
+                if message is None:
+                    return
+                self.wfile.write(message)
+                self.wfile.flush()
+        except OSError:
+            # browser went away
+            pass
+        finally:
+            live.unsubscribe(client)
+
+
+class LiveUpdateServer(object):
+    """ local HTTP server that pushes game_info changes to the panel over Server-Sent Events """
+
+    def __init__(self, cover_dir, port=8765):
+        self.cover_dir = cover_dir
+        self.port = port
+        self.pages = {}
+        self._game_info = None
+        self._clients = set()
+        self._server = None
+        self._lock = threading.Lock()
+
+    @property
+    def running(self):
+        return self._server is not None
+
+    @property
+    def url(self):
+        return "http://127.0.0.1:{}/".format(self.port)
+
+    @staticmethod
+    def page_path(slug):
+        return '/panel/{}'.format(slug)
+
+    def page_url(self, slug):
+        return self.url.rstrip('/') + self.page_path(slug)
+
+    def get_page(self, path):
+        pages = self.pages
+        if path == '/' and pages:
+            return next(iter(pages.values()))
+        return pages.get(path)
+
+    def start(self):
+        if self._server is not None:
+            return
+        self._server = _ThreadingHTTPServer(('127.0.0.1', self.port), _LiveUpdateHandler)
+        self._server.live = self
+        threading.Thread(target=self._server.serve_forever, name="gameinfo-live", daemon=True).start()
+
+    def stop(self):
+        if self._server is None:
+            return
+        with self._lock:
+            for client in self._clients:
+                client.put(None)
+        self._server.shutdown()
+        self._server.server_close()
+        self._server = None
+
+    def subscribe(self):
+        client = queue.Queue()
+        with self._lock:
+            self._clients.add(client)
+            client.put(self._event('snapshot', self._game_info))
+        return client
+
+    def unsubscribe(self, client):
+        with self._lock:
+            self._clients.discard(client)
+
+    def localize(self, game_info):
+        """ the page is served over http, so it can't load file:// covers - route them through /covers/ instead """
+        if game_info is None:
+            return None
+
+        cover_prefix = Path(self.cover_dir).as_uri() + '/'
+        def _route(url):
+            return '/covers/' + url[len(cover_prefix):] if url.startswith(cover_prefix) else url
+
+        return game_info._replace(
+            game_cover=_route(game_info.game_cover),
+            game_covers={size: _route(url) for size, url in game_info.game_covers.items()}
+        )
+
+    def publish(self, game_info):
+        """ send connected pages only the fields that changed since the last publish """
+        fields = game_info._asdict() if game_info is not None else None
+        with self._lock:
+            previous = self._game_info or {}
+            self._game_info = fields
+
+            if fields is None:
+                if not previous:
+                    return
+                # pages clear every field on a null snapshot
+                message = self._event('snapshot', None)
+            else:
+                changed = {k: v for k, v in fields.items() if previous.get(k) != v}
+                changed.update({k: None for k in previous if k not in fields})
+                if not changed:
+                    return
+                message = self._event('delta', changed)
+
+            for client in self._clients:
+                client.put(message)
+
+    @staticmethod
+    def _event(name, data):
+        return "event: {}\ndata: {}\n\n".format(name, json.dumps(data, separators=(',', ':'), default=str)).encode('utf-8')
+
+
+class TemplateRenderer(object):
+    """ renders game info through the user's Jinja2 template, skipping renders and writes that wouldn't change anything """
+
+    def __init__(self):
+        # templates are looked up by a hash of their source, so jinja2's own template
+        # cache ends up compiling each distinct template exactly once
+        self._pending_sources = {}
+        self._env = None
+        self._last_inputs = {}
+        self._last_outputs = {}
+
+    @property
+    def env(self):
+        if self._env is None:
+            self._env = jinja2.Environment(
+                loader=jinja2.FunctionLoader(self._load_template),
+                autoescape=jinja2.select_autoescape(['html'])
+            )
+        return self._env
+
+    def _load_template(self, name):
+        source = self._pending_sources.get(name)
+        if source is None:
+            return None
+        # (source, filename, uptodate) - a hash-named template never goes out of date
+        return source, None, lambda: True
+
+    def compile(self, template_source):
+        """ return the compiled template for template_source, compiling it only the first time we see it """
+        name = hashlib.sha1(template_source.encode('utf-8')).hexdigest() + '.html'
+        self._pending_sources[name] = template_source
+        try:
+            return self.env.get_template(name)
+        finally:
+            del self._pending_sources[name]
+
+    def render(self, template_source, game_info):
+        return self.compile(template_source).render(game_info=game_info)
+
+    def forget(self, output_path):
+        """ make the next render_to_file() for output_path write unconditionally """
+        self._last_inputs.pop(output_path, None)
+        self._last_outputs.pop(output_path, None)
+
+    def render_to_file(self, template_source, game_info, output_path):
+        """ render to output_path if the template or game info changed; returns True if the file was rewritten """
+        inputs = hashlib.sha1(
+            template_source.encode('utf-8') + json.dumps(game_info, sort_keys=True, default=str).encode('utf-8')
+        ).digest()
+        if self._last_inputs.get(output_path) == inputs and os.path.exists(output_path):
+            return False
+
+        html = self.render(template_source, game_info)
+        self._last_inputs[output_path] = inputs
+
+        # changes to things the template doesn't display shouldn't touch the file either
+        output = hashlib.sha1(html.encode('utf-8')).digest()
+        if self._last_outputs.get(output_path) == output and os.path.exists(output_path):
+            return False
+
+        self.write_atomic(output_path, html)
+        self._last_outputs[output_path] = output
+        return True
+
+    @staticmethod
+    def write_atomic(path, text):
+        """ write to a temp file and rename it into place, so the browser never sees half a page """
+        dirname = os.path.dirname(path)
+        os.makedirs(dirname, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=dirname, prefix='.gameinfo-', suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                f.write(text)
+            os.replace(tmp_path, path)
+        except Exception:
+            os.unlink(tmp_path)
+            raise
+
+
+class GameRecord(namedtuple('GameRecord', 'game_name game_cover cover_image_id game_covers release_dates platforms developers publishers')):
+    """ what the templates get as game_info: one game's IGDB data, boiled down to the bits they care about """
+    __slots__ = ()
+
+    @classmethod
+    def from_igdb(cls, game, region_names):
+        """ normalize one IGDB game; every field IGDB might leave out is optional """
+        cover_image_id = (game.get('cover') or {}).get('image_id')
+        game_cover = IGDB_IMAGE_URL.format(size='cover_small', image_id=cover_image_id) if cover_image_id else COVER_PLACEHOLDER
+
+        # Release Dates: we only want the oldest date from each region
+        oldest = {}
+        for release_date in game.get('release_dates') or ():
+            date, region = release_date.get('date'), release_date.get('region')
+            if date is None or region is None:
+                continue
+            if region not in oldest or date < oldest[region]:
+                oldest[region] = date
+
+        release_dates = []
+        for region, date in sorted(oldest.items(), key=lambda i: i[1]):
+            released = time.gmtime(date)
+            release_dates.append({
+                'date': "{:04d}-{:02d}".format(released.tm_year, released.tm_mon),
+                'region': region_names.get(region, str(region))
+            })
+
+        # Platforms: filter out anything that doesn't have a proper abbreviation
+        platforms = sorted(p['abbreviation'] for p in game.get('platforms') or () if 'abbreviation' in p)
+
+        # Developers & publishers
+        developers, publishers = [], []
+        for involved in game.get('involved_companies') or ():
+            company = (involved.get('company') or {}).get('name')
+            if company is None:
+                continue
+            if involved.get('developer'):
+                developers.append(company)
+            if involved.get('publisher'):
+                publishers.append(company)
+
+        return cls(
+            game_name       = game.get('name', ""),
+            game_cover      = game_cover,
+            cover_image_id  = cover_image_id,
+            game_covers     = {},
+            release_dates   = release_dates,
+            platforms       = ", ".join(platforms),
+            developers      = developers,
+            publishers      = publishers
+        )
+
+
 class GameInfo(object):
     IGDB_REGION_ENUM = {
         1: 'EU',
@@ -47,6 +1380,11 @@ class GameInfo(object):
         8: 'World'        
     }
 
+    IGDB_GAME_FIELDS = "id, name, slug, alternative_names.name, platforms.abbreviation, involved_companies.company.name, involved_companies.developer, involved_companies.publisher, cover.image_id, release_dates.date, release_dates.region, release_dates.platform.abbreviation"
+
+    # how similar (0..1) a full-text search hit's name has to be before we'll show it
+    SEARCH_MATCH_THRESHOLD = 0.6
+
     def __init__(self, twitch_client_id=None, twitch_client_secret=None, twitch_username=None, source_name=None, game_override=None, template=None):
         self.source_name = source_name
         self.twitch_client_id = twitch_client_id
@@ -55,122 +1393,507 @@ class GameInfo(object):
         self.twitch_auth_token = None
         self.broadcast_id = None
         self.game_name = None
+        # the category we last got an IGDB answer for; a failed lookup leaves it alone so the poller retries
+        self.resolved_game_name = None
         self.game_override = game_override
         self.game_info = None
         self.template = template
-        
+        self.igdb_cache = IGDBCache(os.path.join(CACHE_DIR, "igdb.sqlite3"))
+        self.game_index = GameIndex(os.path.join(CACHE_DIR, "game_index.sqlite3"))
+        self.twitch_credentials = TwitchCredentialCache(os.path.join(CACHE_DIR, "twitch.json"))
+        self.worker = FetchWorker()
+        self.http = HttpSession()
+        self.timings = StageTimings()
+        self.stats_path = None
+
+        # IGDB allows 4 requests/second and 8 open requests; Helix app tokens get 800 points/minute
+        self.scheduler = RequestScheduler()
+        self.scheduler.add_api('twitch_auth', rate=1, burst=2, max_concurrent=1)
+        self.scheduler.add_api('twitch_helix', rate=800 / 60, burst=10, max_concurrent=4)
+        self.scheduler.add_api('igdb', rate=4, burst=4, max_concurrent=8)
+
+        self.renderer = TemplateRenderer()
+        self.poller = CategoryPoller(self.check_category)
+        self.cover_cache = CoverCache(os.path.join(CACHE_DIR, "covers"), self.http)
+        self.cover_sizes = ['cover_small']
+        self.live_server = LiveUpdateServer(self.cover_cache.path)
+        self._live_template_hashes = {}
+        self.extra_panels = []
+        self._template_files = {}
+        self._prefetch_stop = None
+        self._prefetch_key = None
+        self._revalidating = set()
+        self._revalidate_lock = threading.Lock()
+
     def twitch_api_connect(self):
         """ authenticate against the Twitch API and set object properties """
-        if (self.twitch_client_id is not None) or (self.twitch_client_secret is not None):
-            twitch = Twitch(self.twitch_client_id, self.twitch_client_secret)
-            try:
-                twitch.authenticate_app([])
-            except:
-                # if something goes wrong, at a minimum we want to unset the auth token
-                # so that the script doesn't keep trying to fire unauthorized requests
-                # against IGDB.
-                self.twitch_auth_token = None
-            
-            # pull auth token, broadcast id, and game name from Twitch API
-            self.twitch_auth_token = twitch.get_app_token()
-            self.broadcast_id = twitch.get_users(logins=[self.twitch_username])['data'][0]['id']
-            self.game_name = twitch.get_channel_information(self.broadcast_id)['data'][0]['game_name']
+        if not (self.twitch_client_id and self.twitch_client_secret and self.twitch_username):
+            self.twitch_auth_token = None
+            return
 
-        else:
+        try:
+            try:
+                self.twitch_connect_cached()
+            except requests.HTTPError as e:
+                if e.response is None or e.response.status_code != 401:
+                    raise
+                # our cached token got revoked (or expired early), so mint a new one and go again
+                self.twitch_credentials.invalidate_app_token(self.twitch_client_id)
+                self.twitch_connect_cached()
+        except (requests.RequestException, RequestFailed, LookupError, ValueError) as e:
+            # if something goes wrong, at a minimum we want to unset the auth token
+            # so that the script doesn't keep trying to fire unauthorized requests
+            # against IGDB.
+            print("gameinfo: Twitch lookup failed: {}".format(e))
             self.twitch_auth_token = None
 
+    def twitch_connect_cached(self):
+        """ pull auth token and broadcast id from cache (if possible), then the game name from Twitch """
+        with self.timings.stage('auth'):
+            self.twitch_auth_token = self.twitch_credentials.get_app_token(self.twitch_client_id, self.twitch_fetch_app_token)
+        with self.timings.stage('user_lookup'):
+            self.broadcast_id = self.twitch_credentials.get_broadcaster_id(self.twitch_username, self.twitch_get_broadcaster_id)
+        with self.timings.stage('channel_info'):
+            self.game_name = self.twitch_helix_get('channels', broadcaster_id=self.broadcast_id)['data'][0]['game_name']
+
+    def twitch_fetch_app_token(self):
+        """ client credentials grant; returns Twitch's token response (access_token, expires_in, ...) """
+        def _post():
+            response = self.http.post(TWITCH_TOKEN_URL, params={
+                'client_id': self.twitch_client_id,
+                'client_secret': self.twitch_client_secret,
+                'grant_type': 'client_credentials'
+            })
+            response.raise_for_status()
+            return response
+
+        return self.scheduler.call('twitch_auth', ('token', self.twitch_client_id), _post).json()
+
+    def twitch_get_broadcaster_id(self, username):
+        return self.twitch_helix_get('users', login=username)['data'][0]['id']
+
+    def twitch_helix_get(self, endpoint, **params):
+        """ GET a Twitch Helix endpoint using our app token """
+        def _get():
+            response = self.http.get(TWITCH_HELIX_URL + endpoint, params=params, headers={
+                'Client-Id': self.twitch_client_id,
+                'Authorization': 'Bearer {}'.format(self.twitch_auth_token)
+            })
+            response.raise_for_status()
+            return response
+
+        key = ('helix', endpoint, self.twitch_auth_token, tuple(sorted(params.items())))
+        return self.scheduler.call('twitch_helix', key, _get).json()
+
     def get_current_game(self):
-        """ fetch game info from IGDB """
-        byte_array = None
+        """ fetch game info from IGDB (or the local cache, if we've seen this game recently) """
+        self.game_info = self.lookup_current_game()
+
+    def lookup_current_game(self):
+        """ like get_current_game(), but returns the game info instead of storing it """
+        if self.twitch_auth_token is None:
+            return None
+
+        # the override (if the user supplied one) wins over the current Twitch category
+        lookup_name = self.game_override if self.game_override else self.game_name
+        if not lookup_name:
+            return None
+
+        # Twitch category names are IGDB names; only a hand-typed override gets fuzzy matching
+        fuzzy = bool(self.game_override)
+        game_info, stale = self.igdb_cache.get(lookup_name)
+        if game_info is None:
+            game_info = self.fetch_game(lookup_name, fuzzy)
+            if game_info is None:
+                return None
+            self.igdb_cache.put(lookup_name, game_info)
+        elif stale:
+            # serve what we have now, and refresh it for next time
+            self.revalidate(lookup_name, fuzzy)
+        self.resolved_game_name = self.game_name
+
+        with self.timings.stage('normalize'):
+            return self.parse_game_info(game_info)
+
+    def refresh(self):
+        """ kick off a background Twitch + IGDB lookup, replacing any lookup already in flight """
+        self.worker.submit(self.refresh_job, self.refresh_done)
+
+    def check_category(self):
+        """ poller tick: look at the Twitch category, and only hit IGDB if it has changed """
+        if self.game_override or not self.worker.idle():
+            # the override pins the game, and a lookup that's already running will have fresh data anyway
+            return
+        self.worker.submit(lambda cancelled: self.refresh_job(cancelled, only_if_changed=True), self.check_category_done)
+
+    def check_category_done(self, result):
+        if result is CATEGORY_UNCHANGED:
+            self.poller.unchanged()
+        else:
+            self.poller.changed()
+            self.refresh_done(result)
+
+    def refresh_job(self, cancelled, only_if_changed=False):
+        """ runs on the fetch worker thread """
+        self.twitch_api_connect()
+        if cancelled():
+            return None
+        if only_if_changed and self.game_name == self.resolved_game_name:
+            return CATEGORY_UNCHANGED
 
-        if self.twitch_auth_token is not None:
-            # If we have an auth token, attempt to authenticate to the IGDB API.
+        game_info = self.lookup_current_game()
+        if game_info is not None:
+            game_info = self.localize_covers(game_info)
+        return game_info
+
+    def refresh_done(self, game_info):
+        """ runs on the OBS thread once refresh_job() has finished """
+        self.game_info = game_info
+        self.generate_html()
+        self.export_stats()
+
+    def export_stats(self):
+        """ write the stage timings out for Prometheus (node_exporter textfile collector, etc.), if asked to """
+        if self.timings.enabled and self.stats_path:
             try:
-                igdb = IGDBWrapper(client_id=self.twitch_client_id, auth_token=self.twitch_auth_token)
-            except:
-                # If IGDB shits the bed, set self.game_info to None
-                self.game_info = None
-
-            if self.game_override is not None:
-                # search for game info based on stub supplied by user
-                byte_array = igdb.api_request(
-                    'games',
-                    'fields id, name, platforms.abbreviation, involved_companies.company.name, involved_companies.developer, involved_companies.publisher, cover.image_id, release_dates.date, release_dates.region, release_dates.platform.abbreviation; where name = "{}";'.format(self.game_override)
-                )                
-            else:
-                # search for game based on user's current Twitch category
-                byte_array = igdb.api_request(
-                    'games',
-                    'fields id, name, platforms.abbreviation, involved_companies.company.name, involved_companies.developer, involved_companies.publisher, cover.image_id, release_dates.date, release_dates.region, release_dates.platform.abbreviation; where name = "{}";'.format(self.game_name)
-                )            
-
-            # convert the byte array returned by the IGDB wrapper into something useful
-            game_info = json.loads(byte_array)
-
-            # if game_info is an empty list, we don't need to do anything
-            if len(game_info) > 0:
-
-                # Set the game name
-                game_name = game_info[0]['name']
-
-                # Set the cover image
-                game_cover = "https://images.igdb.com/igdb/image/upload/t_cover_small/{}.jpg".format(game_info[0]['cover']['image_id'])
-
-
-                # Release Dates: we only want the oldest dates from each region
-                release_dates_sorted = sorted(game_info[0]['release_dates'], key = lambda i: i['date'])
-                release_dates_filtered = []
-                for release_date in release_dates_sorted:
-                    if not any(i.get('region', False) == release_date['region'] for i in release_dates_filtered):
-                        release_dates_filtered.append(release_date)
-
-                release_dates_final = []
-                for release_date in release_dates_filtered:
-                    tmp = {
-                        'date': dt.datetime.utcfromtimestamp(release_date['date']).strftime("%Y-%m"),
-                        'region': self.IGDB_REGION_ENUM[release_date['region']]
-                    }
-                    release_dates_final.append(tmp)
-
-                # Platforms: filter out anything that doesn't have a proper abbreviation
-                platforms_filtered = []
-                for platform in game_info[0]['platforms']:
-                    if 'abbreviation' in platform:
-                        platforms_filtered.append(platform['abbreviation'])
-
-                platforms_filtered.sort()
-
-                # Devevelopers & publishers
-                developers_filtered = []
-                for developer in game_info[0]['involved_companies']:
-                    if developer['developer'] == True:
-                        developers_filtered.append(developer['company']['name'])
-
-                publishers_filtered = []
-                for publisher in game_info[0]['involved_companies']:
-                    if publisher['publisher'] == True:
-                        publishers_filtered.append(publisher['company']['name'])
-
-                self.game_info = {
-                    'game_name':        game_name,
-                    'game_cover':       game_cover,
-                    'release_dates':    release_dates_final,
-                    'platforms':        ", ".join(platforms_filtered),
-                    'developers':       developers_filtered,
-                    'publishers':       publishers_filtered
-                }
+                TemplateRenderer.write_atomic(self.stats_path, self.timings.prometheus())
+            except OSError as e:
+                print("gameinfo: couldn't write stats to {}: {}".format(self.stats_path, e))
+
+    def localize_covers(self, game_info):
+        """ game_info with IGDB cover URLs swapped for local copies, queueing downloads for any we don't have yet """
+        image_id = game_info.cover_image_id
+        if image_id is None:
+            return game_info
+
+        game_covers = {}
+        missing = []
+        for size in self.cover_sizes:
+            url = self.cover_cache.get(image_id, size)
+            if url is None:
+                url = COVER_PLACEHOLDER
+                missing.append(size)
+            game_covers[size] = url
+
+        if missing:
+            self.cover_cache.fetch(image_id, missing, lambda *args: self.worker.post(self.cover_ready, *args))
+
+        return game_info._replace(game_covers=game_covers, game_cover=game_covers[self.cover_sizes[0]])
+
+    def cover_ready(self, image_id, size):
+        """ runs on the OBS thread when a cover download lands; swap it in if it's still the current game """
+        if self.game_info is None or self.game_info.cover_image_id != image_id:
+            return
+
+        url = self.cover_cache.get(image_id, size)
+        if url is None:
+            return
+
+        game_covers = dict(self.game_info.game_covers)
+        game_covers[size] = url
+        game_cover = url if size == self.cover_sizes[0] else self.game_info.game_cover
+        self.game_info = self.game_info._replace(game_covers=game_covers, game_cover=game_cover)
+        self.generate_html()
+
+    def fetch_game(self, lookup_name, fuzzy=False, auth_token=None):
+        """ IGDB data for lookup_name: straight by ID if the local index knows the name, else a full search """
+        game_id = self.game_index.resolve(lookup_name, fuzzy)
+        if game_id is not None:
+            game_info = self.query_igdb_by_id(game_id, auth_token)
+            if game_info:
+                return game_info
 
+        return self.query_igdb(lookup_name, auth_token)
+
+    def query_igdb_by_id(self, game_id, auth_token=None):
+        """ fetch one game by IGDB ID; returns [game] ([] if it's gone), or None on failure """
+        try:
+            with self.timings.stage('igdb_query'):
+                response = self.igdb_request('games', 'fields {}; where id = {};'.format(self.IGDB_GAME_FIELDS, int(game_id)), auth_token)
+        except (requests.RequestException, RequestFailed) as e:
+            print("gameinfo: IGDB lookup failed: {}".format(e))
+            return None
+
+        with self.timings.stage('json_decode'):
+            games = response.json()
+        self.game_index.add_games(games)
+        return games[:1]
+
+    def query_igdb(self, lookup_name, auth_token=None):
+        """ look lookup_name up on IGDB; returns a list holding the best match (empty if none), or None on failure """
+        try:
+            with self.timings.stage('igdb_query'):
+                response = self.igdb_request('multiquery', self.build_multiquery(lookup_name), auth_token)
+        except (requests.RequestException, RequestFailed) as e:
+            # If IGDB shits the bed, there's nothing to show
+            print("gameinfo: IGDB lookup failed: {}".format(e))
+            return None
+
+        results = {}
+        with self.timings.stage('json_decode'):
+            for result in response.json():
+                if result['name'] == 'alternative':
+                    results['alternative'] = [i['game'] for i in result['result'] if 'game' in i]
+                else:
+                    results[result['name']] = result['result']
+
+        # only the winner goes in the index; the other search hits are often the wrong sequel
+        best = self.pick_best_match(lookup_name, results)
+        if best is None:
+            return []
+        self.game_index.add_games([best])
+        return [best]
+
+    def igdb_request(self, endpoint, query, auth_token=None):
+        """ POST an Apicalypse query to an IGDB endpoint, with the script's token unless given another """
+        if auth_token is None:
+            auth_token = self.twitch_auth_token
+
+        def _post():
+            response = self.http.post(IGDB_API_URL + endpoint, data=query.encode('utf-8'), headers={
+                'Client-ID': self.twitch_client_id,
+                'Authorization': 'Bearer {}'.format(auth_token)
+            })
+            response.raise_for_status()
+            return response
+
+        return self.scheduler.call('igdb', ('igdb', endpoint, query), _post)
+
+    @classmethod
+    def build_multiquery(cls, lookup_name):
+        """ exact name, slug, alternative name and full-text search lookups, batched into one request """
+        name = lookup_name.replace('\\', '\\\\').replace('"', '\\"')
+        alternative_fields = ", ".join("game." + field.strip() for field in cls.IGDB_GAME_FIELDS.split(","))
+        return (
+            'query games "exact" {{ fields {fields}; where name ~ "{name}"; limit 10; }};'
+            'query games "slug" {{ fields {fields}; where slug = "{slug}"; limit 1; }};'
+            'query alternative_names "alternative" {{ fields {alternative_fields}; where name ~ "{name}"; limit 10; }};'
+            'query games "search" {{ fields {fields}; search "{name}"; limit 10; }};'
+        ).format(fields=cls.IGDB_GAME_FIELDS, alternative_fields=alternative_fields, name=name, slug=cls.slugify(lookup_name))
+
+    @staticmethod
+    def slugify(name):
+        """ best guess at the igdb.com slug for a game name (e.g. "Super Mario World" -> "super-mario-world") """
+        name = unicodedata.normalize('NFKD', name).encode('ascii', 'ignore').decode('ascii')
+        return re.sub(r'[^a-z0-9]+', '-', name.casefold().replace("'", "")).strip('-')
+
+    @classmethod
+    def pick_best_match(cls, lookup_name, results):
+        """ exact name beats slug beats alternative name beats the closest full-text search hit """
+        for strategy in ('exact', 'slug', 'alternative'):
+            if results.get(strategy):
+                return results[strategy][0]
+
+        wanted = IGDBCache.normalize_key(lookup_name)
+        numbers = GameIndex.numbers(GameIndex.normalize(lookup_name))
+        best, best_ratio = None, cls.SEARCH_MATCH_THRESHOLD
+        for game in results.get('search', []):
+            ratio = difflib.SequenceMatcher(None, wanted, IGDBCache.normalize_key(game['name'])).ratio()
+            if ratio > best_ratio and GameIndex.numbers(GameIndex.normalize(game['name'])) == numbers:
+                best, best_ratio = game, ratio
+
+        return best
+
+    def revalidate(self, lookup_name, fuzzy=False):
+        """ refresh a stale cache entry on a background thread """
+        with self._revalidate_lock:
+            if lookup_name in self._revalidating:
+                return
+            self._revalidating.add(lookup_name)
+
+        def _worker():
+            try:
+                game_info = self.fetch_game(lookup_name, fuzzy)
+                if game_info is not None:
+                    self.igdb_cache.put(lookup_name, game_info)
+            finally:
+                with self._revalidate_lock:
+                    self._revalidating.discard(lookup_name)
+
+        threading.Thread(target=_worker, daemon=True).start()
+
+    def prefetch(self, names):
+        """ warm the IGDB and cover caches for a list of games on a background thread (e.g. a marathon schedule) """
+        if self._prefetch_stop is not None:
+            self._prefetch_stop.set()
+        self._prefetch_stop = stop = threading.Event()
+
+        if names:
+            threading.Thread(target=self._prefetch_run, args=(list(names), stop), name="gameinfo-prefetch", daemon=True).start()
+
+    def _prefetch_run(self, names, stop):
+        # the token stays local: twitch_api_connect owns self.twitch_auth_token on the main thread
+        try:
+            auth_token = self.twitch_credentials.get_app_token(self.twitch_client_id, self.twitch_fetch_app_token)
+        except (requests.RequestException, RequestFailed, LookupError, ValueError) as e:
+            print("gameinfo: couldn't prefetch games, Twitch authentication failed: {}".format(e))
+            return
+
+        fetched = cached = missing = 0
+        for name in names:
+            if stop.is_set():
+                return
+
+            game_info, stale = self.igdb_cache.get(name)
+            was_cached = game_info is not None and not stale
+            if not was_cached:
+                # requests go through the scheduler like everything else, so this can't blow the rate limit
+                game_info = self.fetch_game(name, auth_token=auth_token)
+                if game_info is not None:
+                    self.igdb_cache.put(name, game_info)
+
+            if not game_info:
+                missing += 1
+                continue
+
+            if was_cached:
+                cached += 1
             else:
-                self.game_info = None
+                fetched += 1
+            if 'cover' in game_info[0]:
+                self.cover_cache.fetch(game_info[0]['cover']['image_id'], self.cover_sizes)
 
-        else:
-            self.game_info = None
+        print("gameinfo: prefetch done: {} fetched, {} already cached, {} not found".format(fetched, cached, missing))
+
+    def parse_game_info(self, game_info):
+        """ boil an IGDB games response down to a GameRecord, or None if it's empty """
+        if not game_info:
+            return None
+        return GameRecord.from_igdb(game_info[0], self.IGDB_REGION_ENUM)
+
+    def panels(self):
+        """ (browser source, template source) for the main panel and every extra panel """
+        panels = []
+        if self.source_name and self.template:
+            panels.append((self.source_name, self.template))
+
+        for source_name, template_path in self.extra_panels:
+            template = self.read_template(template_path) if template_path else self.template
+            if template:
+                panels.append((source_name, template))
+
+        return panels
+
+    def read_template(self, path):
+        """ template file contents, only re-read when the file changes """
+        try:
+            mtime = os.stat(path).st_mtime
+            cached = self._template_files.get(path)
+            if cached is None or cached[0] != mtime:
+                with open(path, 'r', encoding='utf-8') as f:
+                    cached = self._template_files[path] = (mtime, f.read())
+            return cached[1]
+        except OSError as e:
+            print("gameinfo: couldn't read template {}: {}".format(path, e))
+            return None
 
     def generate_html(self):
-        pass
+        """ render every panel's template and point its browser source at the result """
+        if self.live_server.running:
+            self.generate_live()
+            return
+
+        for source_name, template in self.panels():
+            output_path = self.output_path(source_name)
+            try:
+                with self.timings.stage('render'):
+                    changed = self.renderer.render_to_file(template, self.game_info, output_path)
+            except Exception as e:
+                # most likely a typo in the user's template
+                print("gameinfo: couldn't render template for {}: {}".format(source_name, e))
+                continue
+
+            if changed:
+                with self.timings.stage('source_update'):
+                    self.update_browser_source(source_name, True, output_path)
+
+    def generate_live(self):
+        """ live update mode: push changed fields to the pages, and only reload a page if its template changed """
+        game_info = self.live_server.localize(self.game_info)
+        panels = self.panels()
+
+        pages = {}
+        for source_name, template in panels:
+            try:
+                with self.timings.stage('render'):
+                    # still rendered, so a page that (re)loads from scratch starts out up to date
+                    html = self.inject_live_client(self.renderer.render(template, game_info))
+            except Exception as e:
+                print("gameinfo: couldn't render template for {}: {}".format(source_name, e))
+                continue
+            pages[self.live_server.page_path(self.panel_slug(source_name))] = html
+
+        self.live_server.pages = pages
+        self.live_server.publish(game_info)
+
+        for source_name, template in panels:
+            template_hash = hashlib.sha1(template.encode('utf-8')).digest()
+            if template_hash != self._live_template_hashes.get(source_name):
+                self._live_template_hashes[source_name] = template_hash
+                with self.timings.stage('source_update'):
+                    self.update_browser_source(source_name, False, self.live_server.page_url(self.panel_slug(source_name)))
+
+    @staticmethod
+    def inject_live_client(html):
+        if '/gameinfo.js' in html:
+            return html
+        script = '<script src="/gameinfo.js"></script>'
+        index = html.rfind('</body>')
+        return html[:index] + script + html[index:] if index >= 0 else html + script
+
+    def set_live_updates(self, enabled, port):
+        """ start/stop the live update server; either way, the next generate_html() repoints the browser source """
+        if enabled == self.live_server.running and port == self.live_server.port:
+            return
+
+        self.live_server.stop()
+        self.live_server.port = port
+        self._live_template_hashes = {}
+        for source_name, _ in self.panels():
+            self.renderer.forget(self.output_path(source_name))
+
+        if enabled:
+            try:
+                self.live_server.start()
+            except OSError as e:
+                print("gameinfo: couldn't start live update server on port {}: {}".format(port, e))
+
+    @staticmethod
+    def panel_slug(source_name):
+        return re.sub(r'[^A-Za-z0-9_-]+', '_', source_name)
+
+    @classmethod
+    def output_path(cls, source_name):
+        return os.path.join(CACHE_DIR, "panel_{}.html".format(cls.panel_slug(source_name)))
+
+    def update_browser_source(self, source_name, is_local_file, location):
+        """ point the browser source at a local file or URL, or just reload it if it's already pointed there """
+        source = obs.obs_get_source_by_name(source_name)
+        if source is None:
+            return
+
+        location_key = "local_file" if is_local_file else "url"
+        settings = obs.obs_source_get_settings(source)
+        if obs.obs_data_get_bool(settings, "is_local_file") == is_local_file and obs.obs_data_get_string(settings, location_key) == location:
+            props = obs.obs_source_properties(source)
+            obs.obs_property_button_clicked(obs.obs_properties_get(props, "refreshnocache"), source)
+            obs.obs_properties_destroy(props)
+        else:
+            new_settings = obs.obs_data_create()
+            obs.obs_data_set_bool(new_settings, "is_local_file", is_local_file)
+            obs.obs_data_set_string(new_settings, location_key, location)
+            obs.obs_source_update(source, new_settings)
+            obs.obs_data_release(new_settings)
+
+        obs.obs_data_release(settings)
+        obs.obs_source_release(source)
 
 # create local instance of GameInfo
 gi = GameInfo()
+source_index = SourceIndex(("browser_source",))
+
+# the script's settings object, for button callbacks that need to read other fields
+gi_settings = None
 
 def script_description():
     return """Populate local browser source with game information from IGDB.
@@ -184,16 +1907,80 @@ To customize the panel, you should become acquainted with the Jinja2 template la
 def script_defaults(settings):
     """ Initialize default settings """
     obs.obs_data_set_default_string(settings, "jinja2_template", default_template)
+    obs.obs_data_set_default_int(settings, "cache_ttl_hours", 168)
+    obs.obs_data_set_default_int(settings, "cache_max_entries", 500)
+    obs.obs_data_set_default_bool(settings, "cache_stale_while_revalidate", True)
+    obs.obs_data_set_default_string(settings, "cover_sizes", "cover_small")
+    obs.obs_data_set_default_int(settings, "cover_cache_mb", 64)
+    obs.obs_data_set_default_int(settings, "http_timeout", 10)
+    obs.obs_data_set_default_bool(settings, "poll_offline", False)
+    obs.obs_data_set_default_bool(settings, "stats_enabled", False)
+    obs.obs_data_set_default_bool(settings, "live_updates", False)
+    obs.obs_data_set_default_int(settings, "live_updates_port", 8765)
 
 def script_update(settings):
     """ Do something when the user changes the settings """
+    global gi_settings
+    gi_settings = settings
+
     gi.source_name = obs.obs_data_get_string(settings, "browser_source")
     gi.twitch_client_id = obs.obs_data_get_string(settings, "twitch_client_id")
     gi.twitch_client_secret = obs.obs_data_get_string(settings, "twitch_client_secret")
     gi.twitch_username = obs.obs_data_get_string(settings, "twitch_username")
     gi.game_override = obs.obs_data_get_string(settings, "game_override")
     gi.template = obs.obs_data_get_string(settings, "jinja2_template")
-    #TODO: probably should do something to refresh the object here...
+    gi.extra_panels = parse_extra_panels(obs.obs_data_get_array(settings, "extra_panels"))
+    gi.igdb_cache.ttl = obs.obs_data_get_int(settings, "cache_ttl_hours") * 3600
+    gi.igdb_cache.max_entries = obs.obs_data_get_int(settings, "cache_max_entries")
+    gi.igdb_cache.stale_while_revalidate = obs.obs_data_get_bool(settings, "cache_stale_while_revalidate")
+    gi.http.timeout = obs.obs_data_get_int(settings, "http_timeout")
+    gi.set_live_updates(obs.obs_data_get_bool(settings, "live_updates"), obs.obs_data_get_int(settings, "live_updates_port"))
+    gi.timings.enabled = obs.obs_data_get_bool(settings, "stats_enabled")
+    gi.stats_path = obs.obs_data_get_string(settings, "stats_path")
+    gi.poller.poll_offline = obs.obs_data_get_bool(settings, "poll_offline")
+    gi.poller.start(obs.obs_frontend_streaming_active())
+    gi.cover_cache.max_bytes = obs.obs_data_get_int(settings, "cover_cache_mb") * 1024 * 1024
+    gi.cover_sizes = [size.strip() for size in obs.obs_data_get_string(settings, "cover_sizes").split(",") if size.strip()] or ['cover_small']
+
+    # network calls happen on the fetch worker; results come back via fetch_poll()
+    gi.refresh()
+
+    # (re)start the prefetch if the schedule changed - on the first update after script_load, it always has
+    prefetch_names = read_prefetch_list(obs.obs_data_get_string(settings, "prefetch_games"), obs.obs_data_get_string(settings, "prefetch_file"))
+    # ... or the credentials did, so a prefetch that failed to authenticate gets another go
+    prefetch_key = (prefetch_names, gi.twitch_client_id, gi.twitch_client_secret, gi.twitch_username)
+    if prefetch_key != gi._prefetch_key:
+        gi._prefetch_key = prefetch_key
+        gi.prefetch(prefetch_names)
+
+def read_prefetch_list(games_text, games_file):
+    """ one game per line, from the multiline setting and/or a text file; blank lines and #comments ignored """
+    lines = games_text.splitlines()
+    if games_file:
+        try:
+            with open(games_file, 'r', encoding='utf-8') as f:
+                lines.extend(f.read().splitlines())
+        except OSError as e:
+            print("gameinfo: couldn't read prefetch list {}: {}".format(games_file, e))
+
+    names = []
+    for line in lines:
+        line = line.split('#', 1)[0].strip()
+        if line and line not in names:
+            names.append(line)
+    return names
+
+def parse_extra_panels(panel_array):
+    """ "Source Name | path/to/template.html" entries from the editable list -> [(source name, template path)] """
+    panels = []
+    for i in range(obs.obs_data_array_count(panel_array)):
+        item = obs.obs_data_array_item(panel_array, i)
+        source_name, _, template_path = obs.obs_data_get_string(item, "value").partition("|")
+        obs.obs_data_release(item)
+        if source_name.strip():
+            panels.append((source_name.strip(), template_path.strip()))
+    obs.obs_data_array_release(panel_array)
+    return panels
 
 def script_properties():
     """ Script user interface """
@@ -236,15 +2023,8 @@ def script_properties():
     )
     obs.obs_property_set_long_description(p_game_override, "Search for a game on igdb.com, then browse to the game profile page.  Copy the \"slug\" from the URL (e.g. https://www.igdb.com/games/<slug>) and paste it here to override the game being displayed.")
 
-    sources = obs.obs_enum_sources()
-    if sources is not None:
-        for source in sources:
-            source_id = obs.obs_source_get_unversioned_id(source)
-            if source_id == "browser_source":
-                name = obs.obs_source_get_name(source)
-                obs.obs_property_list_add_string(p_browser_source, name, name)
-        
-        obs.source_list_release(sources)
+    for name in source_index.names():
+        obs.obs_property_list_add_string(p_browser_source, name, name)
 
     obs.obs_property_set_long_description(p_browser_source, "Select the browser source that you want to be used as your gameinfo panel")
 
@@ -255,4 +2035,232 @@ def script_properties():
         obs.OBS_TEXT_MULTILINE
     )
 
+    p_extra_panels = obs.obs_properties_add_editable_list(
+        props,
+        "extra_panels",
+        "Extra Panels",
+        obs.OBS_EDITABLE_LIST_TYPE_STRINGS,
+        None,
+        None
+    )
+    obs.obs_property_set_long_description(p_extra_panels, "Additional browser sources to fill from the same game lookup, one per line as \"Source Name | C:\\path\\to\\template.html\".  Leave the template path off to reuse the template above.")
+
+    obs.obs_properties_add_int(
+        props,
+        "cache_ttl_hours",
+        "IGDB Cache Lifetime (hours)",
+        1,
+        8760,
+        1
+    )
+
+    obs.obs_properties_add_int(
+        props,
+        "cache_max_entries",
+        "IGDB Cache Size (games)",
+        10,
+        10000,
+        10
+    )
+
+    p_cache_swr = obs.obs_properties_add_bool(
+        props,
+        "cache_stale_while_revalidate",
+        "Use expired cache entries while refreshing them"
+    )
+    obs.obs_property_set_long_description(p_cache_swr, "When a cached game has expired, show the cached copy immediately and refresh it from IGDB in the background.")
+
+    p_prefetch_games = obs.obs_properties_add_text(
+        props,
+        "prefetch_games",
+        "Prefetch Games",
+        obs.OBS_TEXT_MULTILINE
+    )
+    obs.obs_property_set_long_description(p_prefetch_games, "Games you're planning to play (one per line), looked up in the background when the script loads so switching to them is instant.")
+
+    obs.obs_properties_add_path(
+        props,
+        "prefetch_file",
+        "Prefetch Games File",
+        obs.OBS_PATH_FILE,
+        "Text (*.txt)",
+        None
+    )
+
+    p_index_import = obs.obs_properties_add_path(
+        props,
+        "game_index_import",
+        "Game Index Import File",
+        obs.OBS_PATH_FILE,
+        "JSON (*.json)",
+        None
+    )
+    obs.obs_property_set_long_description(p_index_import, "Optional.  A JSON list of IGDB games ({id, name, slug, alternative_names: [{name}]}) to add to the local name index, so they resolve without a search.  Games you look up are added automatically.")
+
+    obs.obs_properties_add_button(
+        props,
+        "game_index_import_button",
+        "Import Into Game Index",
+        game_index_import_callback
+    )
+
+    p_cover_sizes = obs.obs_properties_add_text(
+        props,
+        "cover_sizes",
+        "Cover Art Sizes",
+        obs.OBS_TEXT_DEFAULT
+    )
+    obs.obs_property_set_long_description(p_cover_sizes, "Comma-separated IGDB image sizes to mirror locally (e.g. cover_small, cover_big, 720p).  The first one is used for game_info.game_cover; all of them are available as game_info.game_covers[size].")
+
+    obs.obs_properties_add_int(
+        props,
+        "cover_cache_mb",
+        "Cover Art Cache Size (MB)",
+        1,
+        4096,
+        1
+    )
+
+    p_live_updates = obs.obs_properties_add_bool(
+        props,
+        "live_updates",
+        "Live updates (no page reloads)"
+    )
+    obs.obs_property_set_long_description(p_live_updates, "Serve the panel from a small local web server and push changes to it as they happen, instead of reloading the browser source.  Mark elements in your template with data-gameinfo=\"<field>\" (see the default template) to have them updated in place, or listen for the \"gameinfo\" event on document.")
+
+    obs.obs_properties_add_int(
+        props,
+        "live_updates_port",
+        "Live Updates Port",
+        1024,
+        65535,
+        1
+    )
+
+    p_poll_offline = obs.obs_properties_add_bool(
+        props,
+        "poll_offline",
+        "Watch Twitch category while not streaming"
+    )
+    obs.obs_property_set_long_description(p_poll_offline, "The category is checked every few seconds after it changes or the stream starts, backing off to every few minutes while it stays the same.  Normally this stops while you're offline.")
+
+    obs.obs_properties_add_int(
+        props,
+        "http_timeout",
+        "Network Timeout (seconds)",
+        1,
+        120,
+        1
+    )
+
+    obs.obs_properties_add_button(
+        props,
+        "cache_stats",
+        "Log IGDB Cache Stats",
+        cache_stats_callback
+    )
+
+    obs.obs_properties_add_bool(
+        props,
+        "stats_enabled",
+        "Record pipeline timings"
+    )
+
+    p_stats_path = obs.obs_properties_add_path(
+        props,
+        "stats_path",
+        "Timings File (Prometheus)",
+        obs.OBS_PATH_FILE_SAVE,
+        "Prometheus text (*.prom)",
+        None
+    )
+    obs.obs_property_set_long_description(p_stats_path, "Optional.  If set, pipeline timings are written here in Prometheus text format after every refresh.")
+
+    obs.obs_properties_add_button(
+        props,
+        "pipeline_stats",
+        "Log Pipeline Timings",
+        pipeline_stats_callback
+    )
+
     return props
+
+def cache_stats_callback(props, prop):
+    """ dump the IGDB cache counters to the script log """
+    stats = gi.igdb_cache.stats()
+    print("IGDB cache: {hits} hits, {stale_hits} stale hits, {misses} misses ({hit_rate:.0%} hit rate), {entries} entries".format(**stats))
+    return False
+
+def game_index_import_callback(props, prop):
+    """ bulk-load the chosen JSON file into the local game index """
+    path = obs.obs_data_get_string(gi_settings, "game_index_import") if gi_settings is not None else ""
+    if not path:
+        print("gameinfo: pick a game index import file first")
+        return False
+    try:
+        print("gameinfo: imported {} games into the local index".format(gi.game_index.import_file(path)))
+    except (OSError, ValueError, TypeError) as e:
+        print("gameinfo: couldn't import {}: {}".format(path, e))
+    return False
+
+def pipeline_stats_callback(props, prop):
+    """ dump per-stage latency percentiles to the script log """
+    if not gi.timings.enabled:
+        print("gameinfo: pipeline timings are switched off (enable \"Record pipeline timings\")")
+    else:
+        print("gameinfo pipeline timings:\n" + gi.timings.report())
+    return False
+
+def fetch_poll():
+    """ timer callback: apply finished background lookups on the OBS thread """
+    gi.worker.poll()
+
+def on_frontend_event(event):
+    if event == obs.OBS_FRONTEND_EVENT_STREAMING_STARTED:
+        gi.poller.set_streaming(True)
+        gi.check_category()
+    elif event == obs.OBS_FRONTEND_EVENT_STREAMING_STOPPED:
+        gi.poller.set_streaming(False)
+
+def prewarm():
+    """ background thread: import the heavy modules and open the HTTP session before anyone needs them """
+    started = time.perf_counter()
+    requests.load()
+    jinja2.load()
+    gi.http.open()
+    gi.worker.post(log_startup_times, time.perf_counter() - started)
+
+def log_startup_times(prewarm_seconds):
+    print("gameinfo: script import took {:.0f} ms, script_load {:.0f} ms; background pre-warm took {:.0f} ms ({})".format(
+        _SCRIPT_IMPORT_SECONDS * 1000,
+        _SCRIPT_LOAD_SECONDS * 1000,
+        prewarm_seconds * 1000,
+        ", ".join("{} {:.0f} ms".format(name, seconds * 1000) for name, seconds in sorted(LazyModule.import_times.items()))
+    ))
+
+def script_load(settings):
+    global _SCRIPT_LOAD_SECONDS
+    started = time.perf_counter()
+
+    gi.worker.start()
+    obs.timer_add(fetch_poll, 100)
+    obs.obs_frontend_add_event_callback(on_frontend_event)
+    source_index.connect()
+    threading.Thread(target=prewarm, name="gameinfo-prewarm", daemon=True).start()
+
+    _SCRIPT_LOAD_SECONDS = time.perf_counter() - started
+
+def script_unload():
+    source_index.disconnect()
+    gi.prefetch([])
+    gi.poller.stop()
+    gi.live_server.stop()
+    obs.timer_remove(fetch_poll)
+    gi.worker.stop()
+    gi.igdb_cache.close()
+    gi.game_index.close()
+    gi.cover_cache.close()
+    gi.http.close()
+
+_SCRIPT_IMPORT_SECONDS = time.perf_counter() - _SCRIPT_IMPORT_STARTED
+_SCRIPT_LOAD_SECONDS = 0.0
@@ -1,67 +1,205 @@
 import obspython as obs
+import os
+import collections
+from array import array
+
+from script_common import CounterJournal, CounterHistory, SourceIndex, TextSourceRenderer, ControlServer
 
 #######################################################################
-# smw_exit_counter.py - turns a text source in OBS into a rudimentary
-#                       exit counter for Super Mario World.
+# generic_counter.py - turns text sources in OBS into general-purpose
+#                      hotkey-driven counters.
+########################################################################
+# One copy of this script can drive up to MAX_COUNTERS counters (deaths,
+# exits, resets, ...), each with its own text source, prefix/suffix and
+# max value.  "Counter 1" uses the same settings and hotkeys as older
+# versions of this script did; counters 2 and up get their own group in
+# the script settings and their own "LX Generic Counter N: ..." hotkeys.
+#
+# Counter values are saved next to this script (generic_counter.journal
+# and generic_counter.snapshot), so they survive OBS restarts and
+# crashes.  A counter only goes back to its "Counter Start" when that
+# setting is changed.
+#
+# Every change is also timestamped in a per-counter in-memory history,
+# which can add live stats (rate per hour, last/best split, time since
+# the last increment) to a counter's text and is written out as CSV
+# when the stream stops.
 ########################################################################
 
-
-class SMWCounter(object):
-    def __init__(self, source=None, counter_start=0):
-        self.source = source
-        self.counter = counter_start
-        self.counter_prefix = "Exits: "
-        self.counter_suffix = ""
-        self.counter_max_enabled = False
-        self.counter_max = None
-        self.counter_max_delimiter = None
-
-    def update_counter(self):
-        source = obs.obs_get_source_by_name(self.source)
-        if source is not None:
-
-            if self.counter_max_enabled:
-                data = "{}{}{}{}{}".format(self.counter_prefix, self.counter, self.counter_max_delimiter, self.counter_max, self.counter_suffix)
+MAX_COUNTERS = 32
+STATE_PATH = os.path.splitext(os.path.abspath(__file__))[0]
+# "Text (GDI+)" on Windows, "Text (FreeType 2)" on Linux/macOS
+TEXT_SOURCE_TYPES = ("text_gdiplus", "text_ft2_source")
+
+
+def setting_key(key, index):
+    """ counter 1 keeps the original setting names; counter N uses "<key>_N" """
+    return key if index == 0 else "{}_{}".format(key, index + 1)
+
+
+class CounterTable(object):
+    # how often shown stats get re-rendered, so "since" keeps ticking
+    STATS_INTERVAL_MS = 1000
+
+    def __init__(self, size=MAX_COUNTERS, journal=None):
+        self.size = size
+        self.count = 1
+        self.journal = journal
+        self.stats_format = ""
+
+        # one slot per counter; counters only ever touch their own index
+        self.values = array('l', [0]) * size
+        self.maxes = array('l', [0]) * size
+        self.max_enabled = array('b', [0]) * size
+        self.prefixes = ["Exits: "] * size
+        self.suffixes = [""] * size
+        self.delimiters = ["/"] * size
+        # the Counter Start each value was last reset to (None: not known yet)
+        self.starts = [None] * size
+        self.show_stats = array('b', [0]) * size
+        # created on a counter's first change, so unused counters cost nothing
+        self.histories = [None] * size
+
+        # counters past count keep their settings but don't touch their source
+        self.renderer = TextSourceRenderer(lambda index: self.text(index) if index < self.count else None)
+        self._stats_callback = self.tick_stats
+        self._stats_ticking = False
+
+    def configure(self, index, source, start, prefix, suffix, max_enabled, counter_max, delimiter, show_stats=False):
+        self.set_source(index, source)
+        self.set_start(index, start)
+        self.prefixes[index] = prefix
+        self.suffixes[index] = suffix
+        self.max_enabled[index] = max_enabled
+        self.maxes[index] = counter_max
+        self.delimiters[index] = delimiter
+        self.show_stats[index] = show_stats
+        self.update_counter(index)
+
+    def update_stats_timer(self):
+        """ keep the once-a-second stats timer running only while some counter shows stats """
+        ticking = bool(self.stats_format) and any(self.show_stats[index] for index in range(self.count))
+        if ticking != self._stats_ticking:
+            if ticking:
+                obs.timer_add(self._stats_callback, self.STATS_INTERVAL_MS)
             else:
-                data = "{}{}{}".format(self.counter_prefix, self.counter, self.counter_suffix)
-
-            settings = obs.obs_data_create()
-            obs.obs_data_set_string(settings, "text", data)
-            obs.obs_source_update(source, settings)
-            obs.obs_data_release(settings)
-            obs.obs_source_release(source)
-        
-    def increment(self):
-        if self.counter < self.counter_max:
-            self.counter += 1
-            self.update_counter()
-
-    def decrement(self):
-        if self.counter > 0:
-            self.counter -= 1
-            self.update_counter()
-
-    def reset(self):
-        self.counter = 0
-        self.update_counter()
+                obs.timer_remove(self._stats_callback)
+            self._stats_ticking = ticking
+
+    def tick_stats(self):
+        for index in range(self.count):
+            if self.show_stats[index]:
+                self.update_counter(index)
+
+    def history(self, index):
+        if self.histories[index] is None:
+            self.histories[index] = CounterHistory()
+        return self.histories[index]
+
+    def labels(self):
+        """ what each counter with a history is called in the export: its prefix minus the punctuation,
+            with the counter number added where two would otherwise share a name (e.g. "Exits (2)") """
+        labels = {}
+        for index, history in enumerate(self.histories):
+            if history is not None:
+                labels[index] = self.prefixes[index].strip().rstrip(":").strip() or "Counter {}".format(index + 1)
+
+        uses = collections.Counter(labels.values())
+        return {index: label if uses[label] == 1 else "{} ({})".format(label, index + 1) for index, label in labels.items()}
+
+    def history_rows(self):
+        labels = self.labels()
+        for index, history in enumerate(self.histories):
+            if history is not None:
+                for row in history.rows(labels[index]):
+                    yield row
+
+    def restore(self, values, starts):
+        """ saved values from the journal; starts are the Counter Start settings they were counted from """
+        for index in range(self.size):
+            self.starts[index] = starts[index]
+            self.values[index] = values.get(index, starts[index])
+
+    def set_start(self, index, start):
+        """ only a changed Counter Start resets the count; other settings changes leave it alone """
+        if start != self.starts[index]:
+            self.starts[index] = start
+            self.values[index] = start
+            self.changed("r", index)
+
+    def text(self, index):
+        if self.max_enabled[index]:
+            data = "{}{}{}{}{}".format(self.prefixes[index], self.values[index], self.delimiters[index], self.maxes[index], self.suffixes[index])
+        else:
+            data = "{}{}{}".format(self.prefixes[index], self.values[index], self.suffixes[index])
+
+        if self.show_stats[index] and self.stats_format:
+            try:
+                data += self.stats_format.format(**self.history(index).stats())
+            except (KeyError, ValueError, IndexError):
+                pass
+        return data
+
+    def set_source(self, index, name):
+        self.renderer.set_source(index, name)
+
+    def update_counter(self, index):
+        self.renderer.update(index)
+
+    def flush(self):
+        self.renderer.flush()
+
+    def close(self):
+        if self._stats_ticking:
+            obs.timer_remove(self._stats_callback)
+            self._stats_ticking = False
+        self.renderer.close()
+
+    def changed(self, op, index, delta=0):
+        self.history(index).record(op, self.values[index], delta)
+        if self.journal is not None:
+            self.journal.record(op, index, self.values[index])
+        self.update_counter(index)
+
+    def set_value(self, index, value):
+        value = max(0, value)
+        if self.max_enabled[index]:
+            value = min(self.maxes[index], value)
+        previous = self.values[index]
+        self.values[index] = value
+        self.changed("=", index, value - previous)
+
+    def increment(self, index):
+        if not self.max_enabled[index] or self.values[index] < self.maxes[index]:
+            self.values[index] += 1
+            self.changed("+", index, 1)
+
+    def decrement(self, index):
+        if self.values[index] > 0:
+            self.values[index] -= 1
+            self.changed("-", index, -1)
+
+    def reset(self, index):
+        self.values[index] = 0
+        self.changed("r", index)
 
 
 class Hotkey:
-    def __init__(self, callback, obs_settings, _id):
+    def __init__(self, callback, obs_settings, _id, description=None):
         self.obs_data = obs_settings
         self.hotkey_id = obs.OBS_INVALID_HOTKEY_ID
         self.hotkey_saved_key = None
         self.callback = callback
         self._id = _id
+        self.description = description or "LX Generic Counter: " + str(self._id)
 
         self.load_hotkey()
         self.register_hotkey()
         self.save_hotkey()
 
     def register_hotkey(self):
-        description = "LX Generic Counter: " + str(self._id)
         self.hotkey_id = obs.obs_hotkey_register_frontend(
-            "htk_id" + str(self._id), description, self.callback
+            "htk_id" + str(self._id), self.description, self.callback
         )
         obs.obs_hotkey_load(self.hotkey_id, self.hotkey_saved_key)
 
@@ -79,60 +217,147 @@ class Hotkey:
         obs.obs_data_array_release(self.hotkey_saved_key)
 
 
-class h:
-    htk_copy = None
-
-ctr = SMWCounter()
-h_increment = h()
-h_decrement = h()
-h_reset = h()
+class HotkeyDispatcher(object):
+    """ Increment/Decrement/Reset hotkeys for every counter, all routed to one CounterTable """
+    ACTIONS = ("Increment", "Decrement", "Reset")
 
-def increment_callback(pressed):
-    if pressed:
-        ctr.increment()
+    def __init__(self, table):
+        self.table = table
+        self.hotkeys = []
+        self._actions = (table.increment, table.decrement, table.reset)
 
-def decrement_callback(pressed):
-    if pressed:
-        ctr.decrement()
-
-def reset_callback(pressed):
-    if pressed:
-        ctr.reset()
+    def register(self, settings, count):
+        """ register hotkeys for any of the first `count` counters that don't have them yet """
+        while len(self.hotkeys) < count * len(self.ACTIONS):
+            index, action = divmod(len(self.hotkeys), len(self.ACTIONS))
+            name = self.ACTIONS[action]
+            if index == 0:
+                hotkey = Hotkey(self._callback(index, action), settings, name)
+            else:
+                hotkey = Hotkey(
+                    self._callback(index, action), settings, "{}_{}".format(name, index + 1),
+                    "LX Generic Counter {}: {}".format(index + 1, name)
+                )
+            self.hotkeys.append(hotkey)
+
+    def _callback(self, index, action):
+        def callback(pressed):
+            if pressed:
+                self.dispatch(index, action)
+        return callback
+
+    def dispatch(self, index, action):
+        if index < self.table.count:
+            self._actions[action](index)
+
+    def save(self):
+        for hotkey in self.hotkeys:
+            hotkey.save_hotkey()
+
+
+counters = CounterTable(journal=CounterJournal(STATE_PATH))
+hotkeys = HotkeyDispatcher(counters)
+source_index = SourceIndex(TEXT_SOURCE_TYPES)
+history_export_path = ""
+
+def export_history():
+    if history_export_path:
+        try:
+            path = CounterHistory.export_csv(history_export_path, counters.history_rows())
+            print("generic_counter: wrote counter history to {}".format(path))
+        except OSError as e:
+            print("generic_counter: couldn't export history to {}: {}".format(history_export_path, e))
+
+def export_history_callback(props, prop):
+    export_history()
+    return False
+
+def on_frontend_event(event):
+    if event == obs.OBS_FRONTEND_EVENT_STREAMING_STOPPED:
+        export_history()
+
+def execute_control(ops):
+    """ apply a control server batch; every op is checked before any of them is applied """
+    actions = []
+    for op in ops:
+        name = op.get('op')
+        number = op.get('counter', 1)
+        if not isinstance(number, int) or isinstance(number, bool) or not 1 <= number <= counters.count:
+            raise ValueError("no counter {!r}".format(number))
+        if name == 'set':
+            if not isinstance(op.get('value'), int) or isinstance(op.get('value'), bool):
+                raise ValueError("set needs an integer value")
+        elif name not in ('increment', 'decrement', 'reset', 'get'):
+            raise ValueError("unknown op {!r}".format(name))
+        actions.append((name, number - 1, op.get('value')))
+
+    touched = {}
+    for name, index, value in actions:
+        if name == 'set':
+            counters.set_value(index, value)
+        elif name != 'get':
+            getattr(counters, name)(index)
+        touched[index] = None
+    return {str(index + 1): counters.values[index] for index in touched}
+
+control = ControlServer(execute_control, counters.flush)
 
 def counter_max_toggle_callback(props, prop, settings):
-    _show_counter_max = obs.obs_data_get_bool(settings, "counter_max_value_enable")
-    p_counter_max = obs.obs_properties_get(props, "counter_max")
-    p_counter_max_delimiter = obs.obs_properties_get(props, "counter_max_delimiter")
+    key = obs.obs_property_name(prop)
+    suffix = key[len("counter_max_value_enable"):]
+    _show_counter_max = obs.obs_data_get_bool(settings, key)
+    p_counter_max = obs.obs_properties_get(props, "counter_max" + suffix)
+    p_counter_max_delimiter = obs.obs_properties_get(props, "counter_max_delimiter" + suffix)
     obs.obs_property_set_visible(p_counter_max, _show_counter_max)
     obs.obs_property_set_visible(p_counter_max_delimiter, _show_counter_max)
     return True
 
+def counter_count_callback(props, prop, settings):
+    count = obs.obs_data_get_int(settings, "counter_count")
+    for index in range(1, MAX_COUNTERS):
+        p_group = obs.obs_properties_get(props, setting_key("counter_group", index))
+        obs.obs_property_set_visible(p_group, index < count)
+    return True
+
+
 def script_update(settings):
-    ctr.source = obs.obs_data_get_string(settings, "text_source")
-    ctr.counter = obs.obs_data_get_int(settings, "counter_start")
-    ctr.counter_prefix = obs.obs_data_get_string(settings, "counter_prefix")
-    ctr.counter_suffix = obs.obs_data_get_string(settings, "counter_suffix")
-    ctr.counter_max_enabled = obs.obs_data_get_bool(settings, "counter_max_value_enable")
-    if ctr.counter_max_enabled:
-        ctr.counter_max = obs.obs_data_get_int(settings, "counter_max")
-        ctr.counter_max_delimiter = obs.obs_data_get_string(settings, "counter_max_delimiter")
-    else:
-        ctr.counter_max = None
-        ctr.counter_max_delimiter = None
-        
-    ctr.update_counter()
+    count = max(1, min(MAX_COUNTERS, obs.obs_data_get_int(settings, "counter_count")))
+    hotkeys.register(settings, count)
+    counters.count = count
+    counters.stats_format = obs.obs_data_get_string(settings, "stats_format")
+
+    global history_export_path
+    history_export_path = obs.obs_data_get_string(settings, "history_export_path")
+
+    for index in range(count):
+        key = lambda name: setting_key(name, index)
+        counters.configure(
+            index,
+            obs.obs_data_get_string(settings, key("text_source")),
+            obs.obs_data_get_int(settings, key("counter_start")),
+            obs.obs_data_get_string(settings, key("counter_prefix")),
+            obs.obs_data_get_string(settings, key("counter_suffix")),
+            obs.obs_data_get_bool(settings, key("counter_max_value_enable")),
+            obs.obs_data_get_int(settings, key("counter_max")),
+            obs.obs_data_get_string(settings, key("counter_max_delimiter")),
+            obs.obs_data_get_bool(settings, key("stats_enable"))
+        )
+
+    counters.update_stats_timer()
+    control.configure(obs.obs_data_get_bool(settings, "control_enable"), obs.obs_data_get_int(settings, "control_port"))
 
 def script_description():
-    return """Turns a text source into a basic exit counter for Super Mario World (controlled by hotkeys)"""
+    return """Turns text sources into basic counters (controlled by hotkeys)"""
 
-def script_properties():
-    props = obs.obs_properties_create()
+def add_counter_properties(props, index, text_sources):
+    """ the per-counter settings; counter 1's go straight on the script, the rest in their own group """
+    key = lambda name: setting_key(name, index)
 
     # Allows the user to set a default starting value for the counter
     # (default is 0)
     obs.obs_properties_add_int(
         props,
-        "counter_start",
+        key("counter_start"),
         "Counter Start",
         0,
         999,
@@ -143,7 +368,7 @@ def script_properties():
     # (default: "Exits: ")
     obs.obs_properties_add_text(
         props,
-        "counter_prefix",
+        key("counter_prefix"),
         "Counter Prefix",
         obs.OBS_TEXT_DEFAULT
     )
@@ -152,7 +377,7 @@ def script_properties():
     # (default: "")
     obs.obs_properties_add_text(
         props,
-        "counter_suffix",
+        key("counter_suffix"),
         "Counter Suffix",
         obs.OBS_TEXT_DEFAULT
     )
@@ -160,7 +385,7 @@ def script_properties():
     # Enable a max value for the counter
     p_toggle_counter_max = obs.obs_properties_add_bool(
         props,
-        "counter_max_value_enable",
+        key("counter_max_value_enable"),
         "Enable max value for counter?"
     )
 
@@ -168,7 +393,7 @@ def script_properties():
     # (Default: 999)
     p_counter_max = obs.obs_properties_add_int(
         props,
-        "counter_max",
+        key("counter_max"),
         "Counter Max",
         0,
         999,
@@ -177,7 +402,7 @@ def script_properties():
 
     p_counter_max_delimiter = obs.obs_properties_add_text(
         props,
-        "counter_max_delimiter",
+        key("counter_max_delimiter"),
         "Counter Max Delimiter",
         obs.OBS_TEXT_DEFAULT
     )
@@ -187,42 +412,140 @@ def script_properties():
     # Text source for the counter
     p_text_source = obs.obs_properties_add_list(
         props,
-        "text_source",
+        key("text_source"),
         "Text Source",
         obs.OBS_COMBO_TYPE_LIST,
         obs.OBS_COMBO_FORMAT_STRING
     )
 
-    sources = obs.obs_enum_sources()
-    if sources is not None:
-        for source in sources:
-            source_id = obs.obs_source_get_unversioned_id(source)
-            if source_id == "text_gdiplus":
-                name = obs.obs_source_get_name(source)
-                obs.obs_property_list_add_string(p_text_source, name, name)
-        
-    obs.source_list_release(sources)
+    for name in text_sources:
+        obs.obs_property_list_add_string(p_text_source, name, name)
+
+    # Show rate/split stats after the counter (see Stats Format)
+    obs.obs_properties_add_bool(
+        props,
+        key("stats_enable"),
+        "Show stats after the counter?"
+    )
 
     obs.obs_property_set_visible(p_counter_max, False)
     obs.obs_property_set_visible(p_counter_max_delimiter, False)
     obs.obs_property_set_modified_callback(p_toggle_counter_max, counter_max_toggle_callback)
 
+def script_properties():
+    props = obs.obs_properties_create()
+
+    # How many counters this script drives
+    # (default: 1)
+    p_counter_count = obs.obs_properties_add_int(
+        props,
+        "counter_count",
+        "Number of Counters",
+        1,
+        MAX_COUNTERS,
+        1
+    )
+
+    text_sources = source_index.names()
+
+    add_counter_properties(props, 0, text_sources)
+
+    for index in range(1, MAX_COUNTERS):
+        group = obs.obs_properties_create()
+        add_counter_properties(group, index, text_sources)
+        p_group = obs.obs_properties_add_group(
+            props,
+            setting_key("counter_group", index),
+            "Counter {}".format(index + 1),
+            obs.OBS_GROUP_NORMAL,
+            group
+        )
+        obs.obs_property_set_visible(p_group, False)
+
+    obs.obs_property_set_modified_callback(p_counter_count, counter_count_callback)
+
+    p_stats_format = obs.obs_properties_add_text(
+        props,
+        "stats_format",
+        "Stats Format",
+        obs.OBS_TEXT_DEFAULT
+    )
+
+    obs.obs_property_set_long_description(p_stats_format, "Appended to the text of counters that show stats.  {rate} is increments per hour over the last hour, {split} and {best} are the last and best time between increments, {since} is the time since the last increment and {elapsed} the time since the script loaded.")
+
+    p_history_export_path = obs.obs_properties_add_path(
+        props,
+        "history_export_path",
+        "History CSV",
+        obs.OBS_PATH_FILE_SAVE,
+        "CSV (*.csv)",
+        None
+    )
+
+    obs.obs_property_set_long_description(p_history_export_path, "Optional.  If set, every counter change (up to the last 4096 per counter) is written here as CSV when the stream stops.  strftime codes like %Y%m%d-%H%M are filled in.")
+
+    obs.obs_properties_add_button(
+        props,
+        "history_export",
+        "Export History Now",
+        export_history_callback
+    )
+
+    # Local control server, for autosplitters, stream decks, etc.
+    obs.obs_properties_add_bool(
+        props,
+        "control_enable",
+        "Enable local control server?"
+    )
+
+    p_control_port = obs.obs_properties_add_int(
+        props,
+        "control_port",
+        "Control Server Port (UDP)",
+        1024,
+        65535,
+        1
+    )
+
+    obs.obs_property_set_long_description(p_control_port, "UDP port on 127.0.0.1 that accepts JSON commands like {\"op\": \"increment\", \"counter\": 1} (or several at once as {\"ops\": [...]}); ops are increment, decrement, reset, set (with \"value\") and get.  Every command is answered with the counters' current values.")
+
     return props
 
 def script_load(settings):
-    h_increment.htk_copy = Hotkey(increment_callback, settings, "Increment")
-    h_decrement.htk_copy = Hotkey(decrement_callback, settings, "Decrement")
-    h_reset.htk_copy = Hotkey(reset_callback, settings, "Reset")
+    # pick up where the last session left off; script_update() then leaves the counts alone unless Counter Start changes
+    counters.restore(
+        counters.journal.restore(),
+        [obs.obs_data_get_int(settings, setting_key("counter_start", index)) for index in range(MAX_COUNTERS)]
+    )
+    counters.journal.start()
+
+    hotkeys.register(settings, max(1, min(MAX_COUNTERS, obs.obs_data_get_int(settings, "counter_count"))))
+
+    counters.renderer.connect()
+
+    obs.obs_frontend_add_event_callback(on_frontend_event)
+    source_index.connect()
+
+def script_unload():
+    source_index.disconnect()
+    control.stop()
+    counters.close()
+    counters.journal.stop()
 
 def script_save(settings):
-    h_increment.htk_copy.save_hotkey()
-    h_decrement.htk_copy.save_hotkey()
-    h_reset.htk_copy.save_hotkey()
+    hotkeys.save()
 
 def script_defaults(settings):
-    obs.obs_data_set_string(settings, "counter_prefix", "Exits: ")
-    obs.obs_data_set_string(settings, "counter_suffix", "")
-    obs.obs_data_set_int(settings, "counter_start", 0)
-    obs.obs_data_set_int(settings, "counter_max", 999)
-    obs.obs_data_set_string(settings, "counter_max_delimiter", "/")
-    obs.obs_data_set_bool(settings, "counter_max_value_enable", False)
\ No newline at end of file
+    obs.obs_data_set_default_int(settings, "counter_count", 1)
+    obs.obs_data_set_default_string(settings, "stats_format", "  ({rate}/h, last {split}, best {best})")
+    obs.obs_data_set_default_bool(settings, "control_enable", False)
+    obs.obs_data_set_default_int(settings, "control_port", 8766)
+    for index in range(MAX_COUNTERS):
+        key = lambda name: setting_key(name, index)
+        obs.obs_data_set_default_string(settings, key("counter_prefix"), "Exits: ")
+        obs.obs_data_set_default_string(settings, key("counter_suffix"), "")
+        obs.obs_data_set_default_int(settings, key("counter_start"), 0)
+        obs.obs_data_set_default_int(settings, key("counter_max"), 999)
+        obs.obs_data_set_default_string(settings, key("counter_max_delimiter"), "/")
+        obs.obs_data_set_default_bool(settings, key("counter_max_value_enable"), False)
+        obs.obs_data_set_default_bool(settings, key("stats_enable"), False)
\ No newline at end of file
@@ -0,0 +1,574 @@
+import obspython as obs
+import os
+import csv
+import json
+import time
+import queue
+import socket
+import threading
+from array import array
+
+#######################################################################
+# script_common.py - pieces shared by gameinfo.py, generic_counter.py
+#                    and smw_exit_counter.py.
+########################################################################
+# This isn't an OBS script itself: don't add it in "Tools" -> "Scripts".
+# OBS puts each script's folder on the module search path, so it just
+# has to be copied into the same folder as the scripts that import it.
+#
+# OBS matches timer and signal callbacks by identity, so timer_remove()
+# and signal_handler_disconnect() only work when handed the very object
+# that was added.  The classes here (and the scripts) bind each such
+# callback once, in __init__, and keep it in an attribute.
+########################################################################
+
+
+class CounterJournal(object):
+    """ write-behind journal of counter changes, so a crash or restart doesn't lose the count """
+    # record() only queues a line; a background thread writes and fsyncs
+    # whatever has queued up every FLUSH_INTERVAL seconds, and folds the
+    # journal into the snapshot once it gets COMPACT_LINES long
+    FLUSH_INTERVAL = 1.0
+    COMPACT_LINES = 1000
+
+    def __init__(self, path):
+        self.journal_path = path + ".journal"
+        self.snapshot_path = path + ".snapshot"
+        self.values = {}
+        self._pending = []
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self._file = None
+        self._lines = 0
+
+    def restore(self):
+        """ latest value of every counter: the snapshot, with the journal replayed on top """
+        values = {}
+        try:
+            with open(self.snapshot_path, 'r', encoding='utf-8') as f:
+                values = {int(k): v for k, v in json.load(f)['values'].items()}
+        except (OSError, ValueError, KeyError) as e:
+            if os.path.exists(self.snapshot_path):
+                print("counter: couldn't read {}: {}".format(self.snapshot_path, e))
+
+        try:
+            with open(self.journal_path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    # a crash mid-write can leave a torn last line; only whole lines count
+                    if not line.endswith("\n"):
+                        break
+                    try:
+                        op, index, value = line.split()
+                        values[int(index)] = int(value)
+                    except ValueError:
+                        continue
+        except OSError:
+            pass
+
+        self.values = values
+        return dict(values)
+
+    def start(self):
+        """ fold whatever restore() found into a fresh snapshot, then start the writer thread """
+        try:
+            self.compact()
+        except OSError as e:
+            print("counter: couldn't write {}: {}".format(self.snapshot_path, e))
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="counter-journal", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """ write out anything still queued and compact; safe to call more than once """
+        if self._thread is not None:
+            self._stop.set()
+            self._thread.join()
+            self._thread = None
+            try:
+                self.flush()
+                self.compact()
+            except OSError as e:
+                print("counter: couldn't write {}: {}".format(self.journal_path, e))
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def record(self, op, index, value):
+        """ called on the hotkey path: no I/O here, just queue it for the writer thread """
+        with self._lock:
+            self._pending.append("{} {} {}\n".format(op, index, value))
+
+    def _run(self):
+        while not self._stop.wait(self.FLUSH_INTERVAL):
+            try:
+                self.flush()
+                if self._lines >= self.COMPACT_LINES:
+                    self.compact()
+            except OSError as e:
+                print("counter: couldn't write {}: {}".format(self.journal_path, e))
+
+    def flush(self):
+        with self._lock:
+            pending, self._pending = self._pending, []
+        if not pending:
+            return
+
+        if self._file is None:
+            self._file = open(self.journal_path, 'a', encoding='utf-8')
+        self._file.write("".join(pending))
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+        for line in pending:
+            op, index, value = line.split()
+            self.values[int(index)] = int(value)
+        self._lines += len(pending)
+
+    def compact(self):
+        """ replace snapshot + journal with a snapshot of the current values """
+        tmp_path = self.snapshot_path + ".tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({'values': {str(k): v for k, v in self.values.items()}}, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.snapshot_path)
+
+        # the journal only holds absolute values, so a crash between these two steps just replays what's already in the snapshot
+        if self._file is not None:
+            self._file.close()
+        self._file = open(self.journal_path, 'w', encoding='utf-8')
+        self._lines = 0
+
+
+class CounterHistory(object):
+    """ the last CAPACITY counter events in fixed-size arrays, with the stats kept up to date as events come in """
+    CAPACITY = 4096
+    # the rate is net increments per hour over the last RATE_WINDOW seconds
+    RATE_WINDOW = 3600.0
+    # the counters' ops (as in the journal) and what they're called in exported history
+    EVENT_NAMES = {"+": "increment", "-": "decrement", "r": "reset", "=": "set"}
+    OPS = ("+", "-", "r", "=")
+
+    def __init__(self, capacity=CAPACITY, window=RATE_WINDOW):
+        self.capacity = capacity
+        self.window = window
+        self.times = array('d', [0.0]) * capacity
+        self.values = array('l', [0]) * capacity
+        self.ops = array('b', [0]) * capacity
+        self.deltas = array('l', [0]) * capacity
+        self.total = 0                  # events ever recorded; event n lives in slot n % capacity
+        self.started = time.monotonic()
+        self._wall_offset = time.time() - self.started
+
+        self._tail = 0                  # oldest event still inside the rate window
+        self._window_net = 0
+        self.last_increment = None
+        self.last_split = None
+        self.best_split = None
+        self._undo = None
+
+    def __len__(self):
+        return min(self.total, self.capacity)
+
+    def record(self, op, value, delta, now=None):
+        """ O(1): called on the hotkey path; delta is how much value changed (0 for a reset) """
+        now = time.monotonic() if now is None else now
+        slot = self.total % self.capacity
+        if self.total >= self.capacity and self._tail == self.total - self.capacity:
+            # about to overwrite the oldest event while it's still counted in the window
+            self._window_net -= self.deltas[slot]
+            self._tail += 1
+
+        self.times[slot] = now
+        self.values[slot] = value
+        self.ops[slot] = self.OPS.index(op)
+        self.deltas[slot] = delta
+        self.total += 1
+        self._window_net += delta
+        self._expire(now)
+
+        if op == "+":
+            self._undo = (self.last_increment, self.last_split, self.best_split)
+            if self.last_increment is not None:
+                self.last_split = now - self.last_increment
+                if self.best_split is None or self.last_split < self.best_split:
+                    self.best_split = self.last_split
+            self.last_increment = now
+        elif op == "-":
+            # a decrement is usually taking back a mistaken increment, so take its split back too
+            if self._undo is not None:
+                self.last_increment, self.last_split, self.best_split = self._undo
+                self._undo = None
+        elif op == "r":
+            # splits after a reset count from the reset
+            self._undo = None
+            self.last_increment = now
+            self.last_split = None
+        else:
+            # a count set by hand (control server) still goes into the rate, but isn't a split
+            self._undo = None
+
+    def _expire(self, now):
+        # every event enters and leaves the window once, so this is amortized O(1)
+        cutoff = now - self.window
+        while self._tail < self.total and self.times[self._tail % self.capacity] < cutoff:
+            self._window_net -= self.deltas[self._tail % self.capacity]
+            self._tail += 1
+
+    def rate(self, now=None):
+        """ net increments per hour over the rate window (or since the history started, if that's shorter) """
+        now = time.monotonic() if now is None else now
+        self._expire(now)
+        # don't extrapolate wildly off the first few seconds
+        elapsed = max(60.0, min(self.window, now - self.started))
+        return self._window_net * 3600.0 / elapsed
+
+    @staticmethod
+    def format_duration(seconds):
+        if seconds is None:
+            return "-"
+        minutes, seconds = divmod(int(seconds), 60)
+        hours, minutes = divmod(minutes, 60)
+        return "{}:{:02d}:{:02d}".format(hours, minutes, seconds) if hours else "{}:{:02d}".format(minutes, seconds)
+
+    def stats(self, now=None):
+        """ the fields available to the stats format """
+        now = time.monotonic() if now is None else now
+        return {
+            'rate':     "{:.1f}".format(self.rate(now)),
+            'since':    self.format_duration(now - self.last_increment if self.last_increment is not None else None),
+            'split':    self.format_duration(self.last_split),
+            'best':     self.format_duration(self.best_split),
+            'elapsed':  self.format_duration(now - self.started)
+        }
+
+    def rows(self, label):
+        """ (wall clock time, label, event, value) for every event still in the buffer, oldest first """
+        for n in range(self.total - len(self), self.total):
+            slot = n % self.capacity
+            yield (self.times[slot] + self._wall_offset, label, self.EVENT_NAMES[self.OPS[self.ops[slot]]], self.values[slot])
+
+    @staticmethod
+    def export_csv(path, rows):
+        """ write rows() (from one or more histories) out as CSV, sorted by time; strftime codes in path are expanded """
+        path = time.strftime(path)
+        with open(path, 'w', encoding='utf-8', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(["time", "counter", "event", "value"])
+            for timestamp, label, event, value in sorted(rows, key=lambda row: row[0]):
+                stamp = time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(timestamp)) + ".{:03d}".format(int(timestamp % 1 * 1000))
+                writer.writerow([stamp, label, event, value])
+        return path
+
+
+class SourceIndex(object):
+    """ source names by source type, built once and then kept current from OBS's source signals """
+
+    def __init__(self, source_types):
+        self.source_types = tuple(source_types)
+        # name -> None dicts, so names stay in creation order like obs_enum_sources() had them
+        self._names = {source_type: {} for source_type in self.source_types}
+        self._lock = threading.Lock()
+        self._signals = (
+            ("source_create", self._source_created),
+            ("source_destroy", self._source_destroyed),
+            ("source_rename", self._source_renamed)
+        )
+        self._connected = False
+
+    def connect(self):
+        """ listen for source changes, then pick up whatever sources already exist """
+        if self._connected:
+            return
+        signal_handler = obs.obs_get_signal_handler()
+        for signal, callback in self._signals:
+            obs.signal_handler_connect(signal_handler, signal, callback)
+        self._connected = True
+
+        sources = obs.obs_enum_sources()
+        if sources is not None:
+            for source in sources:
+                self._add(source)
+            obs.source_list_release(sources)
+
+    def disconnect(self):
+        if not self._connected:
+            return
+        signal_handler = obs.obs_get_signal_handler()
+        for signal, callback in self._signals:
+            obs.signal_handler_disconnect(signal_handler, signal, callback)
+        self._connected = False
+        with self._lock:
+            for names in self._names.values():
+                names.clear()
+
+    def names(self, *source_types):
+        """ names of every source of the given types (all indexed types if none are given) """
+        with self._lock:
+            return [name for source_type in source_types or self.source_types for name in self._names[source_type]]
+
+    def _add(self, source):
+        names = self._names.get(obs.obs_source_get_unversioned_id(source))
+        if names is not None:
+            with self._lock:
+                names[obs.obs_source_get_name(source)] = None
+
+    # signal callbacks; these can come from any thread
+
+    def _source_created(self, calldata):
+        self._add(obs.calldata_source(calldata, "source"))
+
+    def _source_destroyed(self, calldata):
+        source = obs.calldata_source(calldata, "source")
+        names = self._names.get(obs.obs_source_get_unversioned_id(source))
+        if names is not None:
+            with self._lock:
+                names.pop(obs.obs_source_get_name(source), None)
+
+    def _source_renamed(self, calldata):
+        source = obs.calldata_source(calldata, "source")
+        names = self._names.get(obs.obs_source_get_unversioned_id(source))
+        if names is not None:
+            with self._lock:
+                names.pop(obs.calldata_string(calldata, "prev_name"), None)
+                names[obs.calldata_string(calldata, "new_name")] = None
+
+
+class TextSourceRenderer(object):
+    """ keeps OBS text sources showing text(key) for any number of keys (counters), each with its own source """
+    # changes only mark a key dirty; one timer then re-renders every dirty
+    # source at most once per frame, and only if its text actually changed
+    FLUSH_INTERVAL_MS = 16
+
+    def __init__(self, text):
+        self.text = text            # key -> what its source should show, or None to leave it alone
+        self.sources = {}           # key -> text source name
+        self._weak_sources = {}
+        self._stale = set()         # keys whose source has to be looked up by name again
+        self._rendered = {}
+        self._dirty = set()
+        self._flush_callback = self.flush
+        self._signals = (
+            ("source_rename", self._source_renamed),
+            ("source_destroy", self._source_destroyed)
+        )
+        self._connected = False
+
+    def connect(self):
+        """ follow renamed and destroyed sources """
+        if self._connected:
+            return
+        signal_handler = obs.obs_get_signal_handler()
+        for signal, callback in self._signals:
+            obs.signal_handler_connect(signal_handler, signal, callback)
+        self._connected = True
+
+    def disconnect(self):
+        if not self._connected:
+            return
+        signal_handler = obs.obs_get_signal_handler()
+        for signal, callback in self._signals:
+            obs.signal_handler_disconnect(signal_handler, signal, callback)
+        self._connected = False
+
+    def set_source(self, key, name):
+        if name != self.sources.get(key):
+            self.sources[key] = name
+            self._stale.add(key)
+
+    def source_changed(self, name):
+        """ a source was renamed or destroyed; called from the signal handlers, possibly off the OBS thread """
+        for key, source in list(self.sources.items()):
+            if source == name:
+                self._stale.add(key)
+
+    def _source_renamed(self, calldata):
+        self.source_changed(obs.calldata_string(calldata, "prev_name"))
+        self.source_changed(obs.calldata_string(calldata, "new_name"))
+
+    def _source_destroyed(self, calldata):
+        self.source_changed(obs.obs_source_get_name(obs.calldata_source(calldata, "source")))
+
+    def get_source(self, key):
+        """ the key's text source (caller releases it), resolved by name only when it might have changed """
+        weak_source = self._weak_sources.get(key)
+        if key in self._stale:
+            self._stale.discard(key)
+            if weak_source is not None:
+                obs.obs_weak_source_release(weak_source)
+                weak_source = self._weak_sources[key] = None
+
+        if weak_source is not None:
+            source = obs.obs_weak_source_get_source(weak_source)
+            if source is not None:
+                return source
+            obs.obs_weak_source_release(weak_source)
+            self._weak_sources[key] = None
+
+        source = obs.obs_get_source_by_name(self.sources[key])
+        if source is not None:
+            self._weak_sources[key] = obs.obs_source_get_weak_source(source)
+            # a different source than last time, so whatever we rendered before isn't on it
+            self._rendered[key] = None
+        return source
+
+    def update(self, key):
+        """ re-render key's source on the next frame """
+        if not self._dirty:
+            obs.timer_add(self._flush_callback, self.FLUSH_INTERVAL_MS)
+        self._dirty.add(key)
+
+    def flush(self):
+        """ render every dirty source now """
+        if not self._dirty:
+            return
+        obs.timer_remove(self._flush_callback)
+        dirty, self._dirty = self._dirty, set()
+
+        for key in dirty:
+            if not self.sources.get(key):
+                continue
+            data = self.text(key)
+            if data is None:
+                continue
+            source = self.get_source(key)
+            if source is not None:
+                if data != self._rendered.get(key):
+                    settings = obs.obs_data_create()
+                    obs.obs_data_set_string(settings, "text", data)
+                    obs.obs_source_update(source, settings)
+                    obs.obs_data_release(settings)
+                    self._rendered[key] = data
+                obs.obs_source_release(source)
+
+    def close(self):
+        self.disconnect()
+        if self._dirty:
+            obs.timer_remove(self._flush_callback)
+            self._dirty = set()
+        for key, weak_source in self._weak_sources.items():
+            if weak_source is not None:
+                obs.obs_weak_source_release(weak_source)
+        self._weak_sources = {}
+
+
+class ControlServer(object):
+    """ opt-in UDP endpoint on localhost, so other tools can drive the counters without faking keypresses """
+    # Each datagram is one JSON command, or a batch of them:
+    #   {"op": "increment", "counter": 1}
+    #   {"id": 7, "ops": [{"op": "reset", "counter": 1}, {"op": "set", "counter": 2, "value": 10}]}
+    # ops are increment, decrement, reset, set and get.  The reply is
+    #   {"ok": true, "values": {"1": 0, "2": 10}, "latency_ms": 0.4, "id": 7}
+    # where latency_ms runs from the datagram arriving to the text
+    # sources being updated.
+    #
+    # The socket thread only parses and queues; commands are applied on
+    # the OBS thread by poll(), through the same code the hotkeys use.
+    POLL_INTERVAL_MS = 1        # script timers fire at most once per frame, so this means "every frame"
+    RECV_TIMEOUT = 0.25         # how often the socket thread checks whether it should stop
+    MAX_DATAGRAM = 65507
+
+    def __init__(self, execute, flush):
+        self.execute = execute      # list of ops -> {counter: value}; raises ValueError (or TypeError) on bad ops
+        self.flush = flush          # push pending counter text to the sources right now
+        self.port = None
+        self._sock = None
+        self._thread = None
+        self._stop = threading.Event()
+        self._queue = queue.Queue()
+        self._poll_callback = self.poll
+
+    @property
+    def running(self):
+        return self._sock is not None
+
+    def configure(self, enabled, port):
+        """ (re)start or stop the server to match the settings """
+        if enabled and self.running and port == self.port:
+            return
+        self.stop()
+        if enabled:
+            self.start(port)
+
+    def start(self, port):
+        sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        try:
+            sock.bind(('127.0.0.1', port))
+        except OSError as e:
+            sock.close()
+            print("counter: couldn't start control server on port {}: {}".format(port, e))
+            return
+        sock.settimeout(self.RECV_TIMEOUT)
+
+        self._sock = sock
+        self.port = port
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="counter-control", daemon=True)
+        self._thread.start()
+        obs.timer_add(self._poll_callback, self.POLL_INTERVAL_MS)
+
+    def stop(self):
+        if not self.running:
+            return
+        obs.timer_remove(self._poll_callback)
+        self._stop.set()
+        self._thread.join()
+        self._sock.close()
+        self._sock = None
+        self._thread = None
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                data, address = self._sock.recvfrom(self.MAX_DATAGRAM)
+            except socket.timeout:
+                continue
+            except OSError:
+                break
+            received = time.perf_counter()
+
+            try:
+                message = json.loads(data.decode('utf-8'))
+                ops = message['ops'] if 'ops' in message else [message]
+                if not isinstance(ops, list) or not all(isinstance(op, dict) for op in ops):
+                    raise ValueError("ops must be a list of objects")
+            except (ValueError, TypeError) as e:
+                self._reply(address, {'ok': False, 'error': "bad message: {}".format(e)})
+                continue
+
+            self._queue.put((ops, message.get('id'), address, received))
+
+    def poll(self):
+        """ timer callback: apply queued commands on the OBS thread, then reply """
+        if self._queue.empty():
+            return
+
+        replies = []
+        while True:
+            try:
+                ops, message_id, address, received = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            try:
+                reply = {'ok': True, 'values': self.execute(ops)}
+            except (ValueError, TypeError) as e:
+                # whatever execute() makes of a bad op, the sender still gets an answer
+                reply = {'ok': False, 'error': str(e)}
+            if message_id is not None:
+                reply['id'] = message_id
+            replies.append((address, received, reply))
+
+        # don't leave the changes for the next frame's flush: the whole batch goes on screen now
+        self.flush()
+
+        now = time.perf_counter()
+        for address, received, reply in replies:
+            reply['latency_ms'] = round((now - received) * 1000, 3)
+            self._reply(address, reply)
+
+    def _reply(self, address, reply):
+        try:
+            self._sock.sendto(json.dumps(reply, separators=(',', ':')).encode('utf-8'), address)
+        except (OSError, AttributeError):
+            pass
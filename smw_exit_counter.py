@@ -1,4 +1,7 @@
 import obspython as obs
+import os
+
+from script_common import CounterJournal, CounterHistory, SourceIndex, TextSourceRenderer, ControlServer
 
 #######################################################################
 # smw_exit_counter.py - turns a text source in OBS into a rudimentary
@@ -7,7 +10,8 @@ import obspython as obs
 # How to use:
 # 
 # 1. Install python 3.6.x onto the same system as your OBS installation
-# 2. Copy this script somewhere onto your computer
+# 2. Copy this script, along with script_common.py, into a folder
+#    somewhere on your computer
 # 3. Create a "Text (GDI+)" source and name it something like
 #    "SMW Counter"
 # 4. In OBS, go to "Tools" -> "Scripts"
@@ -32,37 +36,175 @@ import obspython as obs
 #
 # Also, the settings should persist across 
 #
+# The counter itself is saved next to this script (smw_exit_counter.journal
+# and smw_exit_counter.snapshot), so it survives OBS restarts and crashes.
+# It only goes back to "Counter Start" when that setting is changed.
+#
+# Every change is also timestamped in an in-memory history, which can
+# add live stats (exits per hour, last/best split, time since the last
+# exit) to the text and is written out as CSV when the stream stops.
+#
+# Exits can also be counted automatically: enable the exit feed and have
+# an emulator-side Lua script send a UDP datagram to it for every exit
+# taken, e.g.
+#
+#   {"level": 261, "exit": "secret"}
+#
+# where level is the level number (an int, or a hex string like "105")
+# and exit is "normal" or "secret".  Each exit only counts once per run
+# (until the counter is reset, Counter Start is changed or the count is
+# set back to Counter Start), so replaying a level doesn't inflate the
+# count, and the counter never goes past Counter Max.
+#
 ########################################################################
 
+STATE_PATH = os.path.splitext(os.path.abspath(__file__))[0]
+# "Text (GDI+)" on Windows, "Text (FreeType 2)" on Linux/macOS
+TEXT_SOURCE_TYPES = ("text_gdiplus", "text_ft2_source")
+
+
+class ExitSet(object):
+    """ which exits have been counted this run: one bit per (level, normal/secret exit) """
+    # level numbers go up to 0x1FF, in vanilla and in romhacks
+    LEVELS = 0x200
+    EXIT_TYPES = {"normal": 0, "secret": 1}
+
+    def __init__(self, journal=None):
+        self.bits = bytearray(self.LEVELS * len(self.EXIT_TYPES) // 8)
+        self.journal = journal
+
+    def restore(self):
+        """ the exits counted before a restart; the journal stores a 1 (or 0, once cleared) per bit """
+        for bit, value in self.journal.restore().items():
+            if value and 0 <= bit < len(self.bits) * 8:
+                self.bits[bit >> 3] |= 1 << (bit & 7)
+
+    @classmethod
+    def bit(cls, level, exit_type):
+        if isinstance(level, str):
+            level = int(level, 16)
+        if not isinstance(level, int) or isinstance(level, bool) or not 0 <= level < cls.LEVELS:
+            raise ValueError("bad level {!r}".format(level))
+        if not isinstance(exit_type, str) or exit_type not in cls.EXIT_TYPES:
+            raise ValueError("bad exit type {!r}".format(exit_type))
+        return level * len(cls.EXIT_TYPES) + cls.EXIT_TYPES[exit_type]
+
+    def add(self, bit):
+        """ mark an exit as counted; False if it already was """
+        mask = 1 << (bit & 7)
+        if self.bits[bit >> 3] & mask:
+            return False
+        self.bits[bit >> 3] |= mask
+        if self.journal is not None:
+            self.journal.record("x", bit, 1)
+        return True
+
+    def clear(self):
+        if self.journal is not None:
+            for bit in range(len(self.bits) * 8):
+                if self.bits[bit >> 3] & (1 << (bit & 7)):
+                    self.journal.record("x", bit, 0)
+        self.bits = bytearray(len(self.bits))
+
+    def __len__(self):
+        return sum(bin(byte).count("1") for byte in self.bits)
+
+
 class SMWCounter(object):
-    def __init__(self, source=None, counter_start=0, counter_max=96):
-        self.source = source
+    # how often the stats (if shown) get re-rendered, so "since" keeps ticking
+    STATS_INTERVAL_MS = 1000
+
+    def __init__(self, source=None, counter_start=0, counter_max=96, journal=None, exits=None):
         self.counter = counter_start
+        self.counter_start = None
         self.counter_max = counter_max
+        self.journal = journal
+        self.exits = exits
+        self.history = CounterHistory()
+        self.stats_format = None
+        self.renderer = TextSourceRenderer(lambda key: self.text())
+        self.renderer.set_source(0, source)
+        self._stats_callback = self.update_counter
+
+    def text(self):
+        data = "Exits: {}/{}".format(self.counter, self.counter_max)
+        if self.stats_format:
+            try:
+                data += self.stats_format.format(**self.history.stats())
+            except (KeyError, ValueError, IndexError):
+                pass
+        return data
+
+    def set_stats_format(self, stats_format):
+        """ show history stats after the count (None/"" hides them) """
+        if bool(stats_format) != bool(self.stats_format):
+            if stats_format:
+                obs.timer_add(self._stats_callback, self.STATS_INTERVAL_MS)
+            else:
+                obs.timer_remove(self._stats_callback)
+        self.stats_format = stats_format
+
+    def set_source(self, name):
+        self.renderer.set_source(0, name)
 
     def update_counter(self):
-        source = obs.obs_get_source_by_name(self.source)
-        if source is not None:
-            data = "Exits: {}/{}".format(self.counter, self.counter_max)
-            settings = obs.obs_data_create()
-            obs.obs_data_set_string(settings, "text", data)
-            obs.obs_source_update(source, settings)
-            obs.obs_data_release(settings)
-            obs.obs_source_release(source)
-        
+        self.renderer.update(0)
+
+    def flush(self):
+        self.renderer.flush()
+
+    def close(self):
+        self.set_stats_format(None)
+        self.renderer.close()
+
+    def set_start(self, counter_start):
+        """ only a changed Counter Start resets the count; other settings changes leave it alone """
+        if counter_start != self.counter_start:
+            self.counter_start = counter_start
+            self.counter = counter_start
+            self.new_run()
+            self.changed("r")
+
+    def changed(self, op, delta=0):
+        self.history.record(op, self.counter, delta)
+        if self.journal is not None:
+            self.journal.record(op, 0, self.counter)
+        self.update_counter()
+
+    def set_value(self, value):
+        previous = self.counter
+        self.counter = max(0, min(self.counter_max, value))
+        if self.counter <= (self.counter_start or 0):
+            # set back to the start, which is a reset as far as the exits go
+            self.new_run()
+        self.changed("=", self.counter - previous)
+
     def increment(self):
         if self.counter < self.counter_max:
             self.counter += 1
-            self.update_counter()
+            self.changed("+", 1)
 
     def decrement(self):
         if self.counter > 0:
             self.counter -= 1
-            self.update_counter()
+            self.changed("-", -1)
+
+    def exit_taken(self, level, exit_type):
+        """ an exit reported by the emulator feed; only counted the first time this run """
+        bit = ExitSet.bit(level, exit_type)
+        if self.counter < self.counter_max and self.exits.add(bit):
+            self.counter += 1
+            self.changed("+", 1)
 
     def reset(self):
         self.counter = 0
-        self.update_counter()
+        self.new_run()
+        self.changed("r")
+
+    def new_run(self):
+        """ the count went back to the start, so every exit can be counted again """
+        if self.exits is not None:
+            self.exits.clear()
 
 
 class Hotkey:
@@ -101,7 +243,10 @@ class Hotkey:
 class h:
     htk_copy = None
 
-ctr = SMWCounter()
+history_export_path = ""
+
+ctr = SMWCounter(journal=CounterJournal(STATE_PATH), exits=ExitSet(CounterJournal(STATE_PATH + "_exits")))
+source_index = SourceIndex(TEXT_SOURCE_TYPES)
 h_increment = h()
 h_decrement = h()
 h_reset = h()
@@ -119,12 +264,67 @@ def reset_callback(pressed):
         ctr.reset()
 
 
+def export_history():
+    if history_export_path:
+        try:
+            path = CounterHistory.export_csv(history_export_path, ctr.history.rows("Exits"))
+            print("smw_exit_counter: wrote {} events to {}".format(len(ctr.history), path))
+        except OSError as e:
+            print("smw_exit_counter: couldn't export history to {}: {}".format(history_export_path, e))
+
+def export_history_callback(props, prop):
+    export_history()
+    return False
+
+def on_frontend_event(event):
+    if event == obs.OBS_FRONTEND_EVENT_STREAMING_STOPPED:
+        export_history()
+
+def execute_control(ops):
+    """ apply a control server batch; every op is checked before any of them is applied """
+    actions = []
+    for op in ops:
+        name = op.get('op')
+        if op.get('counter', 1) != 1:
+            raise ValueError("no counter {!r}".format(op.get('counter')))
+        if name == 'set':
+            if not isinstance(op.get('value'), int) or isinstance(op.get('value'), bool):
+                raise ValueError("set needs an integer value")
+        elif name not in ('increment', 'decrement', 'reset', 'get'):
+            raise ValueError("unknown op {!r}".format(name))
+        actions.append((name, op.get('value')))
+
+    for name, value in actions:
+        if name == 'set':
+            ctr.set_value(value)
+        elif name != 'get':
+            getattr(ctr, name)()
+    return {"1": ctr.counter}
+
+control = ControlServer(execute_control, ctr.flush)
+
+def execute_exit_events(events):
+    """ apply exits from the emulator feed; a bad event is reported back and skips the rest of its batch """
+    for event in events:
+        ctr.exit_taken(event.get('level'), event.get('exit'))
+    return {"1": ctr.counter}
+
+exit_feed = ControlServer(execute_exit_events, ctr.flush)
+
+
 def script_update(settings):
-    ctr.source = obs.obs_data_get_string(settings, "text_source")
-    ctr.counter = obs.obs_data_get_int(settings, "counter_start")
+    ctr.set_source(obs.obs_data_get_string(settings, "text_source"))
+    ctr.set_start(obs.obs_data_get_int(settings, "counter_start"))
     ctr.counter_max = obs.obs_data_get_int(settings, "counter_max")
+    ctr.set_stats_format(obs.obs_data_get_string(settings, "stats_format") if obs.obs_data_get_bool(settings, "stats_enable") else None)
     ctr.update_counter()
 
+    global history_export_path
+    history_export_path = obs.obs_data_get_string(settings, "history_export_path")
+
+    control.configure(obs.obs_data_get_bool(settings, "control_enable"), obs.obs_data_get_int(settings, "control_port"))
+    exit_feed.configure(obs.obs_data_get_bool(settings, "exit_feed_enable"), obs.obs_data_get_int(settings, "exit_feed_port"))
+
 def script_description():
     return """Turns a text source into a basic exit counter for Super Mario World (controlled by hotkeys)"""
 
@@ -157,28 +357,117 @@ def script_properties():
         obs.OBS_COMBO_FORMAT_STRING
     )
 
-    sources = obs.obs_enum_sources()
-    if sources is not None:
-        for source in sources:
-            source_id = obs.obs_source_get_unversioned_id(source)
-            if source_id == "text_gdiplus":
-                name = obs.obs_source_get_name(source)
-                obs.obs_property_list_add_string(p_text_source, name, name)
-        
-    obs.source_list_release(sources)
+    for name in source_index.names():
+        obs.obs_property_list_add_string(p_text_source, name, name)
+
+    obs.obs_properties_add_bool(
+        props,
+        "stats_enable",
+        "Show stats after the counter?"
+    )
+
+    p_stats_format = obs.obs_properties_add_text(
+        props,
+        "stats_format",
+        "Stats Format",
+        obs.OBS_TEXT_DEFAULT
+    )
+
+    obs.obs_property_set_long_description(p_stats_format, "Appended to the counter text.  {rate} is exits per hour over the last hour, {split} and {best} are the last and best time between exits, {since} is the time since the last exit and {elapsed} the time since the script loaded.")
+
+    p_history_export_path = obs.obs_properties_add_path(
+        props,
+        "history_export_path",
+        "History CSV",
+        obs.OBS_PATH_FILE_SAVE,
+        "CSV (*.csv)",
+        None
+    )
+
+    obs.obs_property_set_long_description(p_history_export_path, "Optional.  If set, every counter change (up to the last 4096) is written here as CSV when the stream stops.  strftime codes like %Y%m%d-%H%M are filled in.")
+
+    obs.obs_properties_add_button(
+        props,
+        "history_export",
+        "Export History Now",
+        export_history_callback
+    )
+
+    # Local control server, for autosplitters, stream decks, etc.
+    obs.obs_properties_add_bool(
+        props,
+        "control_enable",
+        "Enable local control server?"
+    )
+
+    p_control_port = obs.obs_properties_add_int(
+        props,
+        "control_port",
+        "Control Server Port (UDP)",
+        1024,
+        65535,
+        1
+    )
+
+    obs.obs_property_set_long_description(p_control_port, "UDP port on 127.0.0.1 that accepts JSON commands like {\"op\": \"increment\", \"counter\": 1} (or several at once as {\"ops\": [...]}); ops are increment, decrement, reset, set (with \"value\") and get.  Every command is answered with the counters' current values.")
+
+    # Automatic exit counting from an emulator-side script
+    obs.obs_properties_add_bool(
+        props,
+        "exit_feed_enable",
+        "Count exits from emulator feed?"
+    )
+
+    p_exit_feed_port = obs.obs_properties_add_int(
+        props,
+        "exit_feed_port",
+        "Exit Feed Port (UDP)",
+        1024,
+        65535,
+        1
+    )
+
+    obs.obs_property_set_long_description(p_exit_feed_port, "UDP port on 127.0.0.1 that an emulator Lua script sends {\"level\": <level number>, \"exit\": \"normal\" or \"secret\"} to for every exit taken.  Each exit is only counted once until the counter is reset.")
 
     return props
 
 def script_load(settings):
+    # pick up where the last session left off; script_update() then leaves the count alone unless Counter Start changes
+    saved = ctr.journal.restore()
+    ctr.counter_start = obs.obs_data_get_int(settings, "counter_start")
+    ctr.counter = saved.get(0, ctr.counter_start)
+    ctr.journal.start()
+    ctr.exits.restore()
+    ctr.exits.journal.start()
+
     h_increment.htk_copy = Hotkey(increment_callback, settings, "Increment")
     h_decrement.htk_copy = Hotkey(decrement_callback, settings, "Decrement")
     h_reset.htk_copy = Hotkey(reset_callback, settings, "Reset")
 
+    ctr.renderer.connect()
+
+    obs.obs_frontend_add_event_callback(on_frontend_event)
+    source_index.connect()
+
+def script_unload():
+    source_index.disconnect()
+    control.stop()
+    exit_feed.stop()
+    ctr.close()
+    ctr.journal.stop()
+    ctr.exits.journal.stop()
+
 def script_save(settings):
     h_increment.htk_copy.save_hotkey()
     h_decrement.htk_copy.save_hotkey()
     h_reset.htk_copy.save_hotkey()
 
 def script_defaults(settings):
-    obs.obs_data_set_int(settings, "counter_start", 0)
-    obs.obs_data_set_int(settings, "counter_max", 96)
\ No newline at end of file
+    obs.obs_data_set_default_int(settings, "counter_start", 0)
+    obs.obs_data_set_default_int(settings, "counter_max", 96)
+    obs.obs_data_set_default_bool(settings, "stats_enable", False)
+    obs.obs_data_set_default_string(settings, "stats_format", "  ({rate}/h, last {split}, best {best})")
+    obs.obs_data_set_default_bool(settings, "control_enable", False)
+    obs.obs_data_set_default_int(settings, "control_port", 8767)
+    obs.obs_data_set_default_bool(settings, "exit_feed_enable", False)
+    obs.obs_data_set_default_int(settings, "exit_feed_port", 8768)
\ No newline at end of file